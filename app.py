@@ -1,10 +1,17 @@
-import os, sys
-from flask import Flask, request, render_template
+import os, sys, io
+import time
+from flask import Flask, request, render_template, jsonify, g, Response
 from flask_cors import CORS, cross_origin
-from src.pipeline.prediction_pipeline import PredictPipeline, CustomData
-from src.pipeline.training_pipeline import start_training
-from src.utlility import redis_connect, fetch_redis
-from src.logger import logging
+import pandas as pd
+from src.pipeline.prediction_pipeline import PredictPipeline, CustomData, CustomBatchData
+from src.pipeline.micro_batcher import micro_batcher
+from src.pipeline.prediction_cache import prediction_cache
+from src.artifact_cache import artifact_cache
+from src.pipeline.training_jobs import training_jobs
+from src.utlility import credential_cache
+from src.components.schema import process_memory
+from src.metrics import registry, span, request_seconds, request_total, SamplingProfiler
+from src.logger import logging, hot_path
 from src.exception import CustomException
 
 
@@ -14,30 +21,83 @@ from src.exception import CustomException
 app = Flask(__name__)
 CORS(app)
 
+# Unpickle the artifacts once at startup, later requests are served from memory.
+# Loading runs on a background thread so the worker is ready before sklearn is imported,
+# WARM_ARTIFACTS=0 defers it to the first prediction request
+if os.environ.get('WARM_ARTIFACTS', '1') == '1':
+    PredictPipeline().warm_in_background()
+
+# Per-request sampling profiler, only honoured when enabled for the deployment
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '0') == '1'
+PROFILE_DIR = os.path.join('logs', 'profiles')
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profiler = None
+    if PROFILE_REQUESTS and (request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'):
+        g.profiler = SamplingProfiler().start()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unknown'
+    request_seconds.observe(time.perf_counter() - g.get('request_start', time.perf_counter()), endpoint = endpoint, method = request.method)
+    request_total.inc(endpoint = endpoint, method = request.method, status = response.status_code)
+
+    profiler = g.get('profiler')
+    if profiler is not None:
+        g.profiler = None
+        os.makedirs(PROFILE_DIR, exist_ok = True)
+        profile_path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{os.getpid()}.folded")
+        with open(profile_path, 'w') as file:
+            file.write(profiler.stop().folded())
+        response.headers['X-Profile-Path'] = profile_path
+    return response
+
 
 @app.route('/')
 @cross_origin()
 def homePage():
     '''Render Home Page'''
-    logging.info('HomePage Rendered')
+    hot_path.info('HomePage Rendered')
     return render_template('index.html')
 
 @app.route('/predict', methods = ['POST'])
 @cross_origin()
 def predict():
     try:
-        form_data = get_form_data()
+        with span('form_parse'):
+            form_data = get_form_data()
         
         data = CustomData(*form_data)
-        df = data.get_data_as_dataframe()
-        predict_pipeline = PredictPipeline()
-        result = predict_pipeline.predict(df)[0]
+        # Repeated orders are answered from the cache, concurrent misses are predicted together
+        result = prediction_cache.get_or_predict(data, micro_batcher.predict)
         return render_template('result.html', result = result)
 
     except Exception as e:
         logging.error('Prediction Failed')
         logging.error(e)
         raise CustomException(e, sys)
+
+@app.route('/predict/batch', methods = ['POST'])
+@cross_origin()
+def predict_batch():
+    '''Scores a JSON array, CSV or Arrow stream of orders with the CustomData schema.'''
+    try:
+        with span('batch_parse'):
+            batch = get_batch_data()
+        if len(batch.data) > MAX_BATCH_ROWS:
+            return jsonify({'error': f'Batch larger than {MAX_BATCH_ROWS} rows'}), 413
+
+        results = batch.predict(PredictPipeline())
+        hot_path.info('Batch Prediction Success, %d rows', len(results))
+        return jsonify({'predictions': results})
+
+    except ValueError as e:
+        logging.error('Batch Request Parsing Failed')
+        logging.error(e)
+        return jsonify({'error': str(e)}), 400
     
 @app.route('/login', methods=['GET', "POST"])
 @cross_origin()
@@ -47,15 +107,7 @@ def login():
     else:
         user_name = request.form['email']
         password = request.form['password']
-        r = redis_connect(
-        host = 'delivery-time-info.redis.cache.windows.net',
-        port = 6380,
-        db =0,
-        password = 'g1ohvaqFaRceQYOUFfG14fPOh6rp1JuoNAzCaHTjM9s=',
-        ssl = True,
-        decode_responses = True
-    )
-        if password == fetch_redis(r, 'users', user_name):
+        if credential_cache.check(user_name, password):
             global is_logined
             is_logined = True
             return render_template('train.html')
@@ -67,15 +119,82 @@ is_logined = False
 @app.route('/train', methods=['POST'])
 @cross_origin()
 def train():
+    '''Queues a training job and returns its id without waiting for it.'''
     if is_logined:
         url = request.form['dataset-url']
-        start_training(url)
-        log = sorted(os.listdir(os.path.join('logs')))[-1]
-        with open(os.path.join('logs', log)) as log_file:
-            logs = log_file.readlines()
-        return render_template('train_result.html', logs = logs)
+        job_id = training_jobs.submit(url, streaming = bool(request.form.get('streaming')))
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({'job_id': job_id}), 202
+        return render_template('train_result.html', job = training_jobs.status(job_id), logs = [])
     else:
         return render_template('login.html', message = 'Login')
+
+@app.route('/train/append', methods=['POST'])
+@cross_origin()
+def train_append():
+    '''Updates the published model with completed deliveries (CSV or JSON, with the target column), no full retraining.'''
+    if not is_logined:
+        return render_template('login.html', message = 'Login')
+    try:
+        from src.components.incremental_trainer import IncrementalTrainer, MissingStatistics, InvalidDeliveries
+        trainer = IncrementalTrainer()
+
+        data = get_append_data()
+        if trainer.config.target_col_name not in data:
+            return jsonify({'error': f'Missing {trainer.config.target_col_name} column'}), 400
+    except ValueError as e:
+        logging.error('Append Request Parsing Failed')
+        logging.error(e)
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        return jsonify(trainer.append(data))
+    except InvalidDeliveries as e:
+        logging.error('Append Request Validation Failed')
+        logging.error(e)
+        return jsonify({'error': str(e)}), 400
+    except MissingStatistics as e:
+        # e.g. the published model came from the streaming trainer
+        logging.error('Incremental Update Refused')
+        logging.error(e)
+        return jsonify({'error': str(e)}), 409
+
+@app.route('/train/<job_id>')
+@cross_origin()
+def train_status(job_id):
+    '''Stage-level progress and timing of one training job, HTML or JSON.'''
+    if not is_logined:
+        return render_template('login.html', message = 'Login')
+    job = training_jobs.status(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job)
+    return render_template('train_result.html', job = job, logs = training_jobs.log(job_id))
+
+@app.route('/train/<job_id>/log')
+@cross_origin()
+def train_log(job_id):
+    '''Log lines written by this job only.'''
+    if not is_logined:
+        return render_template('login.html', message = 'Login')
+    return jsonify({'job_id': job_id, 'log': training_jobs.log(job_id)})
+
+@app.route('/metrics')
+def metrics():
+    '''Span latency histograms and request counters in the Prometheus text format'''
+    return Response(registry.render(), mimetype = 'text/plain; version=0.0.4')
+
+@app.route('/memory')
+def memory():
+    '''Memory of the worker process that served the request, pss_mb is its share of the pages common to all workers'''
+    return jsonify({'pid': os.getpid(), **process_memory()})
+
+@app.route('/cache-stats')
+@cross_origin()
+def cache_stats():
+    '''Artifact cache hits, misses and load times, prediction cache hit rate'''
+    return jsonify({**artifact_cache.report(), 'predictions': prediction_cache.report()})
     
 def get_form_data():
     try:
@@ -138,7 +257,7 @@ def get_form_data():
         # Type of City
         request.form['city']
         ]
-        logging.info('Form Request Success')
+        hot_path.info('Form Request Success')
 
         return form_data
     
@@ -146,6 +265,40 @@ def get_form_data():
         logging.error('Form Request Failed')
         logging.error(e)
         raise CustomException(e, sys)
+
+MAX_BATCH_ROWS = 100_000
+
+def get_batch_data() -> CustomBatchData:
+    content_type = request.mimetype
+    body = request.get_data()
+
+    if content_type == 'text/csv':
+        return CustomBatchData(pd.read_csv(io.BytesIO(body), dtype = str, keep_default_na = True))
+
+    if content_type in ('application/vnd.apache.arrow.stream', 'application/vnd.apache.arrow.file'):
+        import pyarrow as pa
+        reader = pa.ipc.open_stream if content_type.endswith('stream') else pa.ipc.open_file
+        return CustomBatchData(reader(pa.py_buffer(body)).read_pandas())
+
+    records = request.get_json(force = True, silent = True)
+    if isinstance(records, dict):
+        records = records.get('orders')
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ValueError('Expected a JSON array of order objects')
+    return CustomBatchData.from_records(records)
+
+def get_append_data() -> pd.DataFrame:
+    '''Completed deliveries in the dataset schema, as CSV or a JSON array of objects.'''
+    if request.mimetype == 'text/csv':
+        from src.components.schema import read_csv
+        return read_csv(io.BytesIO(request.get_data()))
+
+    records = request.get_json(force = True, silent = True)
+    if isinstance(records, dict):
+        records = records.get('deliveries')
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ValueError('Expected a JSON array of delivery objects')
+    return pd.DataFrame.from_records(records)
     
 if __name__ == '__main__':
     logging.info('Application Started')
@@ -0,0 +1,82 @@
+import os, sys
+import json
+import subprocess
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Wall time of `import app` in a fresh interpreter, what a new serving worker pays before it can bind
+IMPORT_BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', 1000))
+
+# Modules the serving process must not load at import, they come in with the first
+# prediction (sklearn through the unpickled artifacts), login (redis) or training job
+LAZY_MODULES = ('sklearn', 'scipy', 'redis', 'joblib', 'src.pipeline.training_pipeline', 'src.components.data_transformation')
+
+PROBE = '''
+import sys, time, json
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"ms": seconds * 1000, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+'''
+
+
+def probe(module: str, lazy: tuple = LAZY_MODULES) -> dict:
+    '''Imports module in a fresh interpreter with the start-up warm-up off, so only the import itself is timed.'''
+    env = {**os.environ, 'WARM_ARTIFACTS': '0'}
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module = module, lazy = tuple(lazy))],
+        cwd = ROOT, env = env, capture_output = True, text = True, check = True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, top: int = 10) -> list:
+    '''(cumulative ms, name) of the direct imports of module, from python -X importtime.'''
+    env = {**os.environ, 'WARM_ARTIFACTS': '0'}
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd = ROOT, env = env, capture_output = True, text = True, check = True
+    ).stderr
+
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Two spaces per nesting level, children are printed before their parent
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == module:
+                break
+            rows = []
+        elif depth == 1:
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse = True)[:top]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Checks the cold import time of the serving app against a budget.')
+    parser.add_argument('--module', default = 'app')
+    parser.add_argument('--repeat', type = int, default = 5)
+    parser.add_argument('--budget-ms', type = float, default = IMPORT_BUDGET_MS)
+    args = parser.parse_args()
+
+    runs = [probe(args.module) for _ in range(args.repeat)]
+    best = min(run['ms'] for run in runs)
+    loaded = sorted({name for run in runs for name in run['loaded']})
+
+    print(f'import {args.module}: best {best:.1f} ms of {args.repeat}, budget {args.budget_ms:.0f} ms')
+    for ms, name in slowest_imports(args.module):
+        print(f'  {ms:>9.1f} ms  {name}')
+
+    failed = False
+    if best > args.budget_ms:
+        print(f'OVER BUDGET by {best - args.budget_ms:.1f} ms')
+        failed = True
+    if loaded:
+        print(f'LOADED AT IMPORT: {", ".join(loaded)}')
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,331 @@
+import os, sys
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import write_csv
+
+
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+
+BENCHMARKS = {}
+
+# Smallest dataset the stages can split and cross-validate, smaller sizes only run
+# the function benchmarks against a model trained on this many rows
+MIN_TRAIN_ROWS = 100
+
+# 'concurrent' benchmarks send this many single-row requests from CONCURRENT_CLIENTS threads
+CONCURRENT_REQUESTS = 1000
+CONCURRENT_CLIENTS = 16
+
+
+def benchmark(name: str, kind: str, repeat: int = None):
+    '''Registers fn(context) -> callable, the callable is what gets timed.'''
+    def register(fn):
+        BENCHMARKS[name] = {'setup': fn, 'kind': kind, 'repeat': repeat}
+        return fn
+    return register
+
+
+@dataclass
+class Context:
+    '''Synthetic dataset of n_rows and the artifacts derived from it, built on first use.\n
+        Everything lives in a scratch directory that is the working directory for the
+        run, so the relative artifacts/ paths of the configs resolve inside it.'''
+
+    n_rows: int
+    workdir: str
+    seed: int = 7
+
+    @cached_property
+    def csv_path(self) -> str:
+        return write_csv(os.path.join('artifacts', 'bench.csv'), max(self.n_rows, MIN_TRAIN_ROWS), self.seed)
+
+    @cached_property
+    def data(self) -> pd.DataFrame:
+        return pd.read_csv(self.csv_path, nrows = self.n_rows)
+
+    @cached_property
+    def ingested(self) -> tuple:
+        from src.components.data_ingestion import DataIngestion
+        return DataIngestion().initiate_data_ingestion(self.csv_path)
+
+    @cached_property
+    def transformed(self) -> tuple:
+        from src.components.data_transformation import DataTransform
+        return DataTransform().initiate_data_transform(*self.ingested)
+
+    @cached_property
+    def model_path(self) -> str:
+        from src.components.model_trainer import ModelTrainer
+        train_data, test_data, _ = self.transformed
+        return ModelTrainer().initiate_model_training(train_data, test_data)
+
+    @cached_property
+    def kernel_path(self) -> str:
+        from src.components.model_export import ModelExport
+        _, _, preprocessor_path = self.transformed
+        return ModelExport().initiate_model_export(preprocessor_path, self.model_path)
+
+    @cached_property
+    def features(self) -> pd.DataFrame:
+        from src.pipeline.prediction_pipeline import build_features
+        self.model_path
+        return build_features(self.data.drop(columns = ['Time_taken (min)']))
+
+
+def prepare_workdir(workdir: str) -> None:
+    '''Seeds the scratch artifacts/ with the metadata, so no stage waits on Redis.'''
+    os.makedirs(os.path.join(workdir, 'artifacts'), exist_ok = True)
+    with open(os.path.join('artifacts', 'data-info.json')) as file:
+        info = json.load(file)
+    shutil.copy(os.path.join('artifacts', 'data-info.json'), os.path.join(workdir, 'artifacts', 'data-info.json'))
+
+    from src.components.metadata import METADATA_KEYS
+    snapshot = {name: info[name] for name in METADATA_KEYS}
+    with open(os.path.join(workdir, 'artifacts', 'metadata-snapshot.json'), 'w') as file:
+        json.dump({**snapshot, 'version': 1, 'fetched_at': time.time()}, file)
+
+
+@benchmark('format_24_hour', 'function')
+def bench_format_24_hour(context: Context):
+    from src.utlility import format_24_hour
+    times = context.data['Time_Orderd']
+    return lambda: times.map(format_24_hour)
+
+
+@benchmark('globe_distance', 'function')
+def bench_globe_distance(context: Context):
+    from src.utlility import globe_distance
+    data = context.data
+    return lambda: globe_distance(data, 'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude')
+
+
+@benchmark('add_time_feature', 'function')
+def bench_add_time_feature(context: Context):
+    from src.utlility import add_time_feature
+    data = context.data[['Time_Orderd', 'Time_Order_picked']].copy()
+    return lambda: add_time_feature(data)
+
+
+@benchmark('ingestion', 'stage')
+def bench_ingestion(context: Context):
+    from src.components.data_ingestion import DataIngestion
+    csv_path = context.csv_path
+    return lambda: DataIngestion().initiate_data_ingestion(csv_path)
+
+
+@benchmark('transformation', 'stage')
+def bench_transformation(context: Context):
+    from src.components.data_transformation import DataTransform
+    raw_data_path, split_index_path = context.ingested
+    return lambda: DataTransform().initiate_data_transform(raw_data_path, split_index_path)
+
+
+@benchmark('evalute_model', 'stage')
+def bench_evalute_model(context: Context):
+    from src.components.model_trainer import ModelTrainer
+    from src.utlility import evalute_model
+    train_data, test_data, _ = context.transformed
+    trainer = ModelTrainer()
+    return lambda: evalute_model(
+        train_data[:, :-1], test_data[:, :-1], train_data[:, -1], test_data[:, -1],
+        trainer.build_models(), selection = trainer.config.selection, n_jobs = trainer.config.n_jobs,
+        halving = trainer.halving_options()
+    )
+
+
+@benchmark('predict', 'function')
+def bench_predict(context: Context):
+    from src.pipeline.prediction_pipeline import PredictPipeline
+    features, pipeline = context.features, PredictPipeline()
+    return lambda: pipeline.predict(features)
+
+
+@benchmark('predict_row', 'latency', repeat = 200)
+def bench_predict_row(context: Context):
+    from src.pipeline.prediction_pipeline import PredictPipeline
+    row, pipeline = context.features.iloc[:1], PredictPipeline()
+    return lambda: pipeline.predict(row)
+
+
+@benchmark('kernel_predict_row', 'latency', repeat = 2000)
+def bench_kernel_predict_row(context: Context):
+    from src.pipeline.kernel_predictor import KernelPredictor
+    predictor = KernelPredictor(context.kernel_path)
+    row = {key: (None if pd.isna(value) else value) for key, value in context.features.iloc[0].items()}
+    return lambda: predictor.predict_row(row)
+
+
+@benchmark('predict_concurrent', 'concurrent')
+def bench_predict_concurrent(context: Context):
+    from src.pipeline.prediction_pipeline import PredictPipeline
+    return concurrent_requests(context, lambda data: PredictPipeline().predict(data.get_data_as_dataframe())[0])
+
+
+@benchmark('micro_batch_predict', 'concurrent')
+def bench_micro_batch_predict(context: Context):
+    from src.pipeline.micro_batcher import MicroBatcher, MicroBatcherConfig
+    batcher = MicroBatcher(MicroBatcherConfig(enabled = True))
+    return concurrent_requests(context, batcher.predict)
+
+
+def concurrent_requests(context: Context, predict_one):
+    '''CONCURRENT_REQUESTS CustomData rows, cycled from the dataset, through predict_one on a thread pool.'''
+    from concurrent.futures import ThreadPoolExecutor
+    from dataclasses import fields
+    from src.pipeline.prediction_pipeline import CustomData
+
+    context.model_path
+    columns = context.data[[f.name for f in fields(CustomData)]].astype(object)
+    records = columns.where(columns.notna(), None).itertuples(index = False)
+    rows = [CustomData(*record) for record in records]
+    rows = [rows[i % len(rows)] for i in range(CONCURRENT_REQUESTS)]
+
+    def run():
+        with ThreadPoolExecutor(CONCURRENT_CLIENTS) as pool:
+            return list(pool.map(predict_one, rows))
+    return run
+
+
+def measure(fn, rows: int, repeat: int, warmup: int = 1) -> dict:
+    '''Wall time percentiles over repeat calls, then one more call under tracemalloc for the peak.\n
+        tracemalloc sees Python and numpy allocations, not memory held by C libraries
+        that bypass the Python allocator.'''
+    for _ in range(warmup):
+        fn()
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    ms = np.array(seconds) * 1000
+    p50 = float(np.percentile(ms, 50))
+    return {
+        'repeat': repeat,
+        'mean_ms': round(float(ms.mean()), 4),
+        'p50_ms': round(p50, 4),
+        'p95_ms': round(float(np.percentile(ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(ms, 99)), 4),
+        'rows_per_s': round(rows / (p50 / 1000), 1) if p50 else None,
+        'peak_mb': round(peak / 2 ** 20, 3)
+    }
+
+
+def environment() -> dict:
+    import sklearn
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output = True, text = True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__
+    }
+
+
+def run(sizes: list, names: list, repeat: int, seed: int = 7) -> dict:
+    results = []
+    cwd = os.getcwd()
+    for n_rows in sizes:
+        workdir = tempfile.mkdtemp(prefix = f'bench-{n_rows}-')
+        try:
+            prepare_workdir(workdir)
+            os.chdir(workdir)
+            context = Context(n_rows, workdir, seed)
+            for name in names:
+                spec = BENCHMARKS[name]
+                if spec['kind'] == 'stage' and n_rows < MIN_TRAIN_ROWS:
+                    continue
+                fn = spec['setup'](context)
+                rows = {'latency': 1, 'concurrent': CONCURRENT_REQUESTS}.get(spec['kind'], n_rows)
+                result = {'name': name, 'kind': spec['kind'], 'rows': n_rows, **measure(fn, rows, spec['repeat'] or repeat)}
+                results.append(result)
+                print(f"{name:<18} {n_rows:>10} rows  p50 {result['p50_ms']:>11.3f} ms  p95 {result['p95_ms']:>11.3f} ms  peak {result['peak_mb']:>9.2f} MB", flush = True)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors = True)
+    return {'environment': environment(), 'results': results}
+
+
+def compare(current: dict, baseline: dict, time_threshold: float = 0.10, memory_threshold: float = 0.20) -> list:
+    '''Returns the (name, rows, metric, baseline, current, change) rows over threshold.\n
+        Thresholds are relative, 0.10 flags a p50 more than 10% slower than the baseline.
+        Tail percentiles are recorded but not compared, they are too noisy between runs.'''
+    previous = {(result['name'], result['rows']): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        base = previous.get((result['name'], result['rows']))
+        if base is None:
+            continue
+        for metric, threshold in (('p50_ms', time_threshold), ('peak_mb', memory_threshold)):
+            if not base.get(metric):
+                continue
+            change = result[metric] / base[metric] - 1
+            if change > threshold:
+                regressions.append((result['name'], result['rows'], metric, base[metric], result[metric], round(change, 3)))
+    return regressions
+
+
+def write_json(file_path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok = True)
+    with open(file_path, 'w') as file:
+        json.dump(data, file, indent = 2)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Benchmarks the feature engineering, training and prediction hot paths.')
+    parser.add_argument('--sizes', type = int, nargs = '+', default = [1, 1_000, 100_000])
+    parser.add_argument('--only', nargs = '+', choices = list(BENCHMARKS), default = list(BENCHMARKS))
+    parser.add_argument('--repeat', type = int, default = 5)
+    parser.add_argument('--seed', type = int, default = 7)
+    parser.add_argument('--output', default = None, help = 'defaults to benchmarks/results/<timestamp>.json')
+    parser.add_argument('--baseline', default = BASELINE_PATH)
+    parser.add_argument('--save-baseline', action = 'store_true', help = 'write this run as the new baseline')
+    parser.add_argument('--time-threshold', type = float, default = 0.10)
+    parser.add_argument('--memory-threshold', type = float, default = 0.20)
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.only, args.repeat, args.seed)
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    write_json(output, report)
+    print(f'Results saved at {output}')
+
+    if args.save_baseline:
+        write_json(args.baseline, report)
+        print(f'Baseline saved at {args.baseline}')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.time_threshold, args.memory_threshold)
+        for name, rows, metric, before, after, change in regressions:
+            print(f'REGRESSION {name} {rows} rows {metric}: {before} -> {after} ({change:+.1%})')
+        sys.exit(1 if regressions else 0)
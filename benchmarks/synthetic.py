@@ -0,0 +1,129 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+
+DATA_INFO_PATH = os.path.join('artifacts', 'data-info.json')
+
+COLUMNS = [
+    'ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings',
+    'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude',
+    'Order_Date', 'Time_Orderd', 'Time_Order_picked', 'Weather_conditions', 'Road_traffic_density',
+    'Vehicle_condition', 'Type_of_order', 'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City',
+    'Time_taken (min)'
+]
+
+# Share of missing values per column, close to artifacts/test.csv
+MISSING_RATE = {
+    'Delivery_person_Age': 0.04,
+    'Delivery_person_Ratings': 0.04,
+    'Time_Orderd': 0.04,
+    'Weather_conditions': 0.015,
+    'Road_traffic_density': 0.015,
+    'multiple_deliveries': 0.025,
+    'Festival': 0.005,
+    'City': 0.027,
+}
+
+
+def load_categories(data_info_path: str = DATA_INFO_PATH) -> dict:
+    with open(data_info_path) as file:
+        info = json.load(file)
+    return {name: info[name] for name in ('personID', 'weather', 'traffic', 'order', 'vehicle', 'festival', 'city')}
+
+
+# Every HH:MM up to 24:59, generated rows index into it instead of formatting strings
+CLOCK = np.array([f'{minute // 60:02d}:{minute % 60:02d}' for minute in range(25 * 60)], dtype = object)
+DATES = np.array(pd.date_range('2022-02-11', periods = 55).strftime('%d-%m-%Y'), dtype = object)
+
+
+def generate(n_rows: int, seed: int = 7, categories: dict = None, start: int = 0) -> pd.DataFrame:
+    '''n_rows of synthetic orders with the artifacts/test.csv schema.\n
+        Carries the same quirks as the real data: missing values, 24:xx and HH:MM:SS
+        times, Excel fractions in Time_Orderd, a few negative coordinates. The target
+        depends on distance, traffic, weather and the rider, so models have signal.'''
+    categories = categories or load_categories()
+    rng = np.random.default_rng(seed)
+    choice = lambda values: np.asarray(values, dtype = object)[rng.integers(0, len(values), n_rows)]
+
+    rest_lat = rng.uniform(9, 31, n_rows)
+    rest_lon = rng.uniform(72, 89, n_rows)
+    deliv_lat = rest_lat + rng.choice([0.01, 0.02, 0.03, 0.06, 0.09, 0.12], n_rows)
+    deliv_lon = rest_lon + rng.choice([0.01, 0.02, 0.03, 0.06, 0.09, 0.12], n_rows)
+    flip = rng.random(n_rows) < 0.01
+    rest_lat[flip] = -rest_lat[flip]
+
+    ordered = rng.integers(8 * 60, 24 * 60, n_rows)
+    picked = ordered + rng.choice([5, 10, 15], n_rows)
+    # Picked past midnight comes out as 24:MM like in the source data
+    ordered_text, picked_text = CLOCK[ordered], CLOCK[picked]
+    with_seconds = rng.random(n_rows) < 0.05
+    picked_text[with_seconds] = picked_text[with_seconds] + ':00'
+    excel = rng.random(n_rows) < 0.01
+    ordered_text[excel] = (ordered[excel] / (24 * 60)).round(9).astype(str)
+
+    weather, traffic = choice(categories['weather']), choice(categories['traffic'])
+    age = rng.integers(20, 40, n_rows).astype(float)
+    ratings = np.round(rng.uniform(3.5, 5.0, n_rows), 1)
+    vehicle_condition = rng.integers(0, 4, n_rows)
+    multiple = rng.choice([0.0, 1.0, 2.0, 3.0], n_rows, p = [0.3, 0.6, 0.07, 0.03])
+    festival = np.where(rng.random(n_rows) < 0.02, 'Yes', 'No').astype(object)
+
+    distance = np.hypot(deliv_lat - np.abs(rest_lat), deliv_lon - rest_lon) * 111
+    traffic_delay = pd.Series(traffic).map({'Low': 0, 'Medium': 4, 'High': 6, 'Jam': 10}).to_numpy(dtype = float)
+    weather_delay = np.where(np.isin(weather, ['Fog', 'Cloudy']), 5.0, 0.0)
+    target = (
+        12 + 0.9 * distance + traffic_delay + weather_delay + 3 * multiple
+        + 0.2 * (age - 20) - 6 * (ratings - 4.5) - 2 * vehicle_condition
+        + 8 * (festival == 'Yes') + rng.normal(0, 4, n_rows)
+    )
+
+    data = pd.DataFrame({
+        'ID': np.char.add('0x', np.char.mod('%x', np.arange(start, start + n_rows))).astype(object),
+        'Delivery_person_ID': choice(categories['personID']),
+        'Delivery_person_Age': age,
+        'Delivery_person_Ratings': ratings,
+        'Restaurant_latitude': rest_lat.round(6),
+        'Restaurant_longitude': rest_lon.round(6),
+        'Delivery_location_latitude': deliv_lat.round(6),
+        'Delivery_location_longitude': deliv_lon.round(6),
+        'Order_Date': DATES[rng.integers(0, len(DATES), n_rows)],
+        'Time_Orderd': ordered_text,
+        'Time_Order_picked': picked_text,
+        'Weather_conditions': weather,
+        'Road_traffic_density': traffic,
+        'Vehicle_condition': vehicle_condition,
+        'Type_of_order': choice(categories['order']),
+        'Type_of_vehicle': choice(categories['vehicle']),
+        'multiple_deliveries': multiple,
+        'Festival': festival,
+        'City': choice(categories['city']),
+        'Time_taken (min)': np.clip(np.round(target), 10, 54).astype(int),
+    }, columns = COLUMNS)
+
+    for column, rate in MISSING_RATE.items():
+        data.loc[rng.random(n_rows) < rate, column] = np.nan
+    return data
+
+
+def write_csv(file_path: str, n_rows: int, seed: int = 7, chunk_size: int = 1_000_000) -> str:
+    '''Writes n_rows to file_path chunk by chunk, 10M rows never sit in memory at once.'''
+    categories = load_categories()
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok = True)
+    for index, start in enumerate(range(0, n_rows, chunk_size)):
+        chunk = generate(min(chunk_size, n_rows - start), seed + index, categories, start)
+        chunk.to_csv(file_path, mode = 'w' if index == 0 else 'a', header = index == 0, index = False)
+    return file_path
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Writes a synthetic dataset with the artifacts/test.csv schema.')
+    parser.add_argument('rows', type = int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type = int, default = 7)
+    args = parser.parse_args()
+    write_csv(args.output, args.rows, args.seed)
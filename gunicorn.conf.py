@@ -0,0 +1,21 @@
+import gc
+import os
+
+# Read by gunicorn from the working directory, e.g. `gunicorn app:app` on the App Service.
+# The app, the libraries it imports and the artifacts are loaded once in the master before
+# forking, the workers share those pages copy-on-write instead of each loading its own copy.
+# Each worker logs to logs/app.<pid>.log, the master alone writes and rotates logs/app.log.
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Threads per worker, the micro-batcher needs concurrent requests inside one process
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def when_ready(server):
+    from src.pipeline.prediction_pipeline import PredictPipeline
+
+    # Waits for the background warm-up, a fork while it holds the artifact cache lock would deadlock the worker
+    PredictPipeline().warm()
+    # Everything allocated so far is left alone by the collector, so it does not write to the shared pages
+    gc.freeze()
+    server.log.info('Artifacts loaded before fork, workers share them')
@@ -0,0 +1,130 @@
+import os, sys
+import hashlib
+import threading
+import time
+from src.exception import CustomException
+from src.logger import logging
+from src.utlility import loadObject
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class ArtifactEntry:
+    obj: Any
+    mtime_ns: int
+    size: int
+    sha256: str
+    load_time: float
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    '''Returns the hex sha256 of the file content, read in blocks.'''
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class ArtifactCache:
+    '''Process-wide cache of joblib artifacts.\n
+        An artifact is unpickled once and served from memory until its file changes.
+        A changed mtime/size triggers a content hash check, the object is reloaded
+        only if the hash differs and is swapped in atomically under a lock.'''
+
+    entries: dict = field(default_factory = dict)
+    stats: dict = field(default_factory = lambda: {'hits': 0, 'misses': 0, 'reloads': 0, 'load_time': 0.0})
+    lock: threading.Lock = field(default_factory = threading.Lock)
+    # Arrays stay in the memory-mapped file, shared by every worker on the host; '' copies them
+    mmap_mode: str = os.environ.get('ARTIFACT_MMAP_MODE', 'r') or None
+    load_lock: threading.Lock = field(default_factory = threading.Lock)
+
+    def get(self, file_path: str) -> Any:
+        try:
+            stat = os.stat(file_path)
+            entry = self.entries.get(file_path)
+
+            if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+                with self.lock:
+                    self.stats['hits'] += 1
+                return entry.obj
+
+            # One loader at a time, a request arriving during the startup warm-up waits for it
+            with self.load_lock:
+                entry = self.entries.get(file_path)
+                if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+                    with self.lock:
+                        self.stats['hits'] += 1
+                    return entry.obj
+
+                # File is new or touched, only reload when the content really changed
+                sha256 = file_sha256(file_path)
+                if entry is not None and entry.sha256 == sha256:
+                    with self.lock:
+                        self.entries[file_path] = ArtifactEntry(entry.obj, stat.st_mtime_ns, stat.st_size, sha256, entry.load_time)
+                        self.stats['hits'] += 1
+                    return entry.obj
+
+                start = time.perf_counter()
+                obj = loadObject(file_path, mmap_mode = self.mmap_mode)
+                load_time = time.perf_counter() - start
+
+                with self.lock:
+                    self.entries[file_path] = ArtifactEntry(obj, stat.st_mtime_ns, stat.st_size, sha256, load_time)
+                    self.stats['misses'] += 1
+                    self.stats['load_time'] += load_time
+                    if entry is not None:
+                        self.stats['reloads'] += 1
+
+            logging.info(f'Artifact Cache Loaded {file_path} in {load_time * 1000:.2f} ms')
+            return obj
+
+        except Exception as e:
+            logging.error(f'FAIL Artifact Cache Load {file_path}')
+            logging.error(e)
+            raise CustomException(e, sys)
+
+    def warm(self, *file_paths: str) -> None:
+        '''Loads every existing artifact so the first request does not pay the unpickling.'''
+        for file_path in file_paths:
+            if os.path.exists(file_path):
+                self.get(file_path)
+            else:
+                logging.warning(f'Artifact Cache Warm Skipped, {file_path} not found')
+
+    def warm_in_background(self, *file_paths: str) -> threading.Thread:
+        '''warm() on a daemon thread, the caller (e.g. app start-up) does not wait for the unpickling.'''
+        def run():
+            try:
+                self.warm(*file_paths)
+            except Exception as e:
+                logging.warning('Background Artifact Warm Failed, loading on first request')
+                logging.warning(e)
+
+        thread = threading.Thread(target = run, daemon = True)
+        thread.start()
+        return thread
+
+    def version(self, *file_paths: str) -> str:
+        '''Returns the combined content hash of the cached artifacts.'''
+        return hashlib.sha256(
+            ''.join(self.entries[file_path].sha256 for file_path in file_paths).encode()
+        ).hexdigest()
+
+    def report(self) -> dict:
+        with self.lock:
+            report = dict(self.stats)
+            report['artifacts'] = {
+                path: {'sha256': entry.sha256, 'load_time': entry.load_time}
+                for path, entry in self.entries.items()
+            }
+        return report
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+artifact_cache = ArtifactCache()
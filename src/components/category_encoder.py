@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+
+# Code of a value that is not in the category list
+UNKNOWN_CODE = -1
+# Internal marker for missing values until they are replaced by the fill code
+MISSING_CODE = -2
+
+
+def column_codes(index: pd.Index, column: pd.Series) -> np.ndarray:
+    '''int32 position of every value in index, UNKNOWN_CODE if absent, MISSING_CODE if missing.\n
+        Categorical columns are looked up once per category and then gathered by
+        their own codes, object columns once per row through the Index hash table.'''
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Trailing slot maps pandas' -1 (missing) code
+        mapping = np.append(index.get_indexer(column.cat.categories), MISSING_CODE).astype(np.int32)
+        return mapping[column.cat.codes.to_numpy()]
+
+    codes = index.get_indexer(column).astype(np.int32)
+    codes[column.isna().to_numpy()] = MISSING_CODE
+    return codes
+
+
+def category_array(categories) -> np.ndarray:
+    '''Fixed-width unicode when every category is a string, stored flat by joblib and so
+        memory-mappable, an object array of Python objects otherwise.'''
+    categories = np.asarray(categories, dtype = object)
+    if len(categories) and all(isinstance(category, str) for category in categories):
+        return categories.astype(str)
+    return categories
+
+
+class CategoryCodeEncoder(BaseEstimator, TransformerMixin):
+    '''Encodes categorical columns as int32 codes into fixed category lists.\n
+        Replaces SimpleImputer(most_frequent) + OrdinalEncoder: each category list
+        becomes a pd.Index once, so a value costs one hash lookup instead of a search
+        over an object array. Missing values take the code of the most frequent
+        category seen in fit, values outside the list take UNKNOWN_CODE.\n
+        categories: list of category lists, one per column, or 'auto' to use the
+        sorted values seen in fit.'''
+
+    def __init__(self, categories = 'auto'):
+        self.categories = categories
+
+    def fit(self, X, y = None):
+        X = X if isinstance(X, pd.DataFrame) else pd.DataFrame(X)
+        categories = self.categories
+        if isinstance(categories, str) and categories == 'auto':
+            categories = [sorted(X[col].dropna().unique()) for col in X.columns]
+        if len(categories) != X.shape[1]:
+            raise ValueError(f'Got {len(categories)} category lists for {X.shape[1]} columns')
+
+        self.categories_ = [category_array(cats) for cats in categories]
+        self.indexes_ = [pd.Index(cats, dtype = object) for cats in self.categories_]
+        self.n_features_in_ = X.shape[1]
+        self.feature_names_in_ = np.asarray(X.columns, dtype = object)
+
+        self.fill_codes_ = np.zeros(X.shape[1], dtype = np.int32)
+        for k, (index, col) in enumerate(zip(self.indexes_, X.columns)):
+            codes = column_codes(index, X[col])
+            counts = np.bincount(codes[codes >= 0], minlength = len(index))
+            self.fill_codes_[k] = int(np.argmax(counts)) if counts.any() else 0
+        return self
+
+    def transform(self, X) -> np.ndarray:
+        X = X if isinstance(X, pd.DataFrame) else pd.DataFrame(X, columns = self.feature_names_in_)
+        out = np.empty(X.shape, dtype = np.int32)
+        for k, (index, col) in enumerate(zip(self.indexes_, X.columns)):
+            codes = column_codes(index, X[col])
+            codes[codes == MISSING_CODE] = self.fill_codes_[k]
+            out[:, k] = codes
+        return out
+
+    def __getstate__(self):
+        # The pickle keeps only the flat category arrays, the lookup indexes are rebuilt on load
+        state = dict(super().__getstate__())
+        state.pop('indexes_', None)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if 'categories_' in state and 'indexes_' not in state:
+            self.indexes_ = [pd.Index(cats, dtype = object) for cats in self.categories_]
+
+    def get_feature_names_out(self, input_features = None):
+        return np.asarray(self.feature_names_in_ if input_features is None else input_features, dtype = object)
@@ -0,0 +1,176 @@
+from src.logger import logging
+from src.components.model_selection import candidate_grid
+
+import numpy as np
+from dataclasses import dataclass
+from sklearn.base import clone
+from sklearn.linear_model import Ridge, ElasticNet, RidgeCV
+from sklearn.model_selection import KFold
+
+
+@dataclass
+class SufficientStatistics:
+    '''Everything a linear least-squares fit needs from a block of rows.'''
+    n: float
+    sum_x: np.ndarray
+    sum_y: float
+    xtx: np.ndarray
+    xty: np.ndarray
+    yty: float
+
+    @classmethod
+    def from_data(cls, X: np.ndarray, y: np.ndarray) -> 'SufficientStatistics':
+        return cls(len(y), X.sum(axis = 0), float(y.sum()), X.T @ X, X.T @ y, float(y @ y))
+
+    def __add__(self, other):
+        return SufficientStatistics(*(a + b for a, b in zip(self.astuple(), other.astuple())))
+
+    def __sub__(self, other):
+        return SufficientStatistics(*(a - b for a, b in zip(self.astuple(), other.astuple())))
+
+    def astuple(self) -> tuple:
+        return (self.n, self.sum_x, self.sum_y, self.xtx, self.xty, self.yty)
+
+    def centered(self) -> tuple:
+        '''Returns (Gram, X^T y, x mean, y mean) of the mean-centered rows.'''
+        x_mean, y_mean = self.sum_x / self.n, self.sum_y / self.n
+        gram = self.xtx - self.n * np.outer(x_mean, x_mean)
+        xy = self.xty - self.n * x_mean * y_mean
+        return gram, xy, x_mean, y_mean
+
+    def standardized(self, mean: np.ndarray, scale: np.ndarray) -> 'SufficientStatistics':
+        '''Statistics of the rows (x - mean) / scale, computed from these ones.'''
+        shifted_xtx = self.xtx - np.outer(mean, self.sum_x) - np.outer(self.sum_x, mean) + self.n * np.outer(mean, mean)
+        return SufficientStatistics(
+            self.n,
+            (self.sum_x - self.n * mean) / scale,
+            self.sum_y,
+            shifted_xtx / np.outer(scale, scale),
+            (self.xty - mean * self.sum_y) / scale,
+            self.yty
+        )
+
+    def sse(self, coef: np.ndarray, intercept: float) -> float:
+        '''Sum of squared residuals of (coef, intercept) over these rows, without the rows.'''
+        return float(
+            self.yty - 2 * intercept * self.sum_y - 2 * coef @ self.xty + coef @ self.xtx @ coef
+            + 2 * intercept * coef @ self.sum_x + self.n * intercept ** 2
+        )
+
+    def sst(self) -> float:
+        '''Total sum of squares of y around its own mean, the R^2 denominator.'''
+        return self.yty - self.sum_y ** 2 / self.n
+
+
+def solve_ridge(gram: np.ndarray, xy: np.ndarray, alpha: float) -> np.ndarray:
+    '''Ridge closed form, ||y - Xw||^2 + alpha ||w||^2 as in sklearn.'''
+    return np.linalg.solve(gram + alpha * np.eye(len(xy)), xy)
+
+
+def solve_enet(gram: np.ndarray, xy: np.ndarray, n: float, alpha: float, l1_ratio: float,
+               coef: np.ndarray = None, max_iter: int = 1000, tol: float = 1e-4) -> np.ndarray:
+    '''Covariance-update coordinate descent for the sklearn ElasticNet objective\n
+        1 / (2n) ||y - Xw||^2 + alpha * l1_ratio ||w||_1 + 0.5 * alpha * (1 - l1_ratio) ||w||^2\n
+        coef warm-starts the descent, e.g. from the previous alpha on the path.'''
+    l1_reg, l2_reg = alpha * l1_ratio * n, alpha * (1 - l1_ratio) * n
+    coef = np.zeros(len(xy)) if coef is None else coef.copy()
+    diag = np.diag(gram)
+    grad = gram @ coef
+
+    for _ in range(max_iter):
+        max_change = max_coef = 0.0
+        for j in range(len(coef)):
+            if diag[j] == 0:
+                continue
+            old = coef[j]
+            rho = xy[j] - grad[j] + diag[j] * old
+            new = np.sign(rho) * max(abs(rho) - l1_reg, 0.0) / (diag[j] + l2_reg)
+            if new != old:
+                grad += gram[:, j] * (new - old)
+                coef[j] = new
+            max_change = max(max_change, abs(new - old))
+            max_coef = max(max_coef, abs(new))
+        if max_change <= tol * max(max_coef, 1e-12):
+            break
+    return coef
+
+
+def solve_estimator(stats: SufficientStatistics, estimator, alpha: float, coef: np.ndarray = None) -> tuple:
+    '''Returns (coef, intercept) of estimator with alpha fit to the rows behind stats.'''
+    gram, xy, x_mean, y_mean = stats.centered()
+    if isinstance(estimator, ElasticNet):
+        coef = solve_enet(gram, xy, stats.n, alpha, estimator.l1_ratio, coef, estimator.max_iter, estimator.tol)
+    elif isinstance(estimator, Ridge):
+        coef = solve_ridge(gram, xy, alpha)
+    else:
+        raise ValueError(f'Unsupported estimator {type(estimator).__name__}')
+    return coef, y_mean - x_mean @ coef
+
+
+@dataclass
+class GramCVEngine:
+    '''K-fold CV from per-fold sufficient statistics.\n
+        One pass over X builds X^T X, X^T y and the sums for every validation
+        fold; each training fold is the total minus its fold. Every model family
+        and alpha is then solved and scored from those p x p matrices only.'''
+
+    X: np.ndarray
+    y: np.ndarray
+    cv: int = 5
+
+    def __post_init__(self):
+        self.folds = [SufficientStatistics.from_data(self.X[idx], self.y[idx]) for _, idx in KFold(n_splits = self.cv).split(self.X)]
+        self.total = self.folds[0]
+        for fold in self.folds[1:]:
+            self.total = self.total + fold
+
+    def solve(self, stats: SufficientStatistics, estimator, alpha: float, coef: np.ndarray = None) -> tuple:
+        return solve_estimator(stats, estimator, alpha, coef)
+
+    def path_mse(self, estimator, alphas: list) -> np.ndarray:
+        '''Validation MSE, shape (folds, alphas), alphas walked largest first with warm starts.'''
+        order = np.argsort(alphas)[::-1]
+        mse = np.empty((len(self.folds), len(alphas)))
+        for k, fold in enumerate(self.folds):
+            train = self.total - fold
+            coef = None
+            for i in order:
+                coef, intercept = self.solve(train, estimator, alphas[i], coef)
+                mse[k, i] = fold.sse(coef, intercept) / fold.n
+        return mse
+
+    def path_r2(self, estimator, alphas: list) -> np.ndarray:
+        '''Validation R^2, shape (folds, alphas), the default score of RidgeCV with an integer cv.'''
+        sse = self.path_mse(estimator, alphas) * np.array([[fold.n] for fold in self.folds])
+        return 1 - sse / np.array([[fold.sst()] for fold in self.folds])
+
+    def fit(self, estimator, alpha: float):
+        '''Returns estimator refit on all rows, from the total statistics.'''
+        coef, intercept = self.solve(self.total, estimator, alpha)
+        model = clone(estimator).set_params(alpha = alpha)
+        model.coef_, model.intercept_, model.n_features_in_ = coef, float(intercept), len(coef)
+        return model
+
+
+def gram_model_selection(X_train: np.ndarray, y_train: np.ndarray, models: dict) -> dict:
+    '''Selects the alpha of every *CV model with one shared GramCVEngine per fold count\n
+        and returns {name: fitted best estimator}. Other models are fit as they are.'''
+    engines, fitted = {}, {}
+    for name, model in models.items():
+        estimator, alphas, cv = candidate_grid(model)
+        if cv is None:
+            fitted[name] = clone(model).fit(X_train, y_train)
+            continue
+
+        engine = engines.get(cv) or engines.setdefault(cv, GramCVEngine(X_train, y_train, cv))
+        if isinstance(model, RidgeCV) and model.scoring is None:
+            # RidgeCV ranks alphas by the mean fold R^2, not the mean fold MSE
+            loss, metric = -engine.path_r2(estimator, alphas).mean(axis = 0), 'R2'
+        else:
+            loss, metric = engine.path_mse(estimator, alphas).mean(axis = 0), 'MSE'
+        best = int(np.argmin(loss))
+        best_alpha = alphas[best]
+        fitted[name] = engine.fit(estimator, best_alpha)
+        logging.info(f'Gram CV {name}: best alpha {best_alpha}, CV {metric} {abs(loss[best]):.4f}')
+
+    return fitted
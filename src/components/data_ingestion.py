@@ -1,8 +1,9 @@
 import os, sys
 from src.exception import CustomException
 from src.logger import logging
+from src.components.dataset_cache import DatasetCache
+from src.components.schema import read_csv
 import numpy as np
-import pandas as pd
 from sklearn.model_selection import train_test_split as tts
 from dataclasses import dataclass
 
@@ -10,40 +11,56 @@ from dataclasses import dataclass
 # Data Ingesttion Process
 @dataclass
 class DataIngestionConfig:
-    train_data_path: str = os.path.join('artifacts', 'train.csv')
-    test_data_path: str = os.path.join('artifacts', 'test.csv')
-    raw_data_path: str = os.path.join('artifacts', 'raw.csv')
+    # Raw data stored once as typed, compressed columns, the split as row indices into it
+    raw_data_path: str = os.path.join('artifacts', 'raw.parquet')
+    split_index_path: str = os.path.join('artifacts', 'split.npz')
+    test_size: float = 0.3
+    random_state: int = 7
 
 @dataclass
 class DataIngestion:
     config = DataIngestionConfig()
 
-    def initiate_data_ingestion(self, url: str, *args, **kwargs):
-        logging.info('Data Ingestion Method Start')
-        try:
-            data = pd.read_csv(url, *args, **kwargs)
-            logging.info('PASS Dataset Load')
+    def fetch(self, url: str) -> str:
+        '''Local path of the dataset, remote sources are downloaded once and revalidated.'''
+        return DatasetCache().fetch(url)
+
+    def ingest(self, url: str, *args, **kwargs) -> str:
+        '''Loads the source with the declared schema dtypes and stores it as artifacts/raw.parquet.'''
+        data = read_csv(url, *args, **kwargs)
+        logging.info('PASS Dataset Load')
+
+        os.makedirs(os.path.dirname(self.config.raw_data_path), exist_ok = True)
+        data.to_parquet(self.config.raw_data_path, index = False, compression = 'zstd')
+        logging.info(f'Raw File Saved at {self.config.raw_data_path}')
+        return self.config.raw_data_path
 
-            os.makedirs(os.path.dirname(self.config.raw_data_path), exist_ok = True)
-            data.to_csv(self.config.raw_data_path, index = False)
-            logging.info(f'Raw File Saved at {self.config.raw_data_path}')
+    def split(self) -> str:
+        '''Stores the train/test row indices of the raw file as artifacts/split.npz.'''
+        import pyarrow.parquet as pq
 
-            # Splitting Data in training and testing
-            train_data, test_data = tts(data, test_size = 0.3, random_state = 7)
-            logging.info('PASS Data Split')
+        n_rows = pq.read_metadata(self.config.raw_data_path).num_rows
 
-            # Saving Train Test Data
-            train_data.to_csv(self.config.train_data_path, index = False, header = True)
-            logging.info(f'Train Split Saved at {self.config.raw_data_path}')
+        # Splitting Data in training and testing
+        train_idx, test_idx = tts(np.arange(n_rows, dtype = np.int32 if n_rows < 2**31 else np.int64), test_size = self.config.test_size, random_state = self.config.random_state)
+        logging.info('PASS Data Split')
 
-            test_data.to_csv(self.config.test_data_path, index = False, header = True)
-            logging.info(f'Test Split Saved at {self.config.raw_data_path}')
+        # Saving Train Test row indices
+        np.savez(self.config.split_index_path, train = train_idx, test = test_idx)
+        logging.info(f'Train Test Split Saved at {self.config.split_index_path}')
+        return self.config.split_index_path
+
+    def initiate_data_ingestion(self, url: str, *args, **kwargs):
+        logging.info('Data Ingestion Method Start')
+        try:
+            self.ingest(self.fetch(url), *args, **kwargs)
+            self.split()
 
             logging.info('PASS Data Ingestion')
 
             return (
-                self.config.train_data_path,
-                self.config.test_data_path
+                self.config.raw_data_path,
+                self.config.split_index_path
             )
         
         except Exception as e:
@@ -52,17 +69,16 @@ class DataIngestion:
             raise CustomException(e, sys)
 
 
-
 from src.components.data_transformation import DataTransform
 from src.components.model_trainer import ModelTrainer
 
 if __name__ == "__main__":
     start = DataIngestion()
-    train_path, test_path = start.initiate_data_ingestion()
-    print(train_path)
-    print(test_path)
+    raw_path, split_path = start.initiate_data_ingestion()
+    print(raw_path)
+    print(split_path)
     data_transform = DataTransform()
-    train_data, test_data, preprocessor = data_transform.initiate_data_transform(train_path, test_path)
+    train_data, test_data, preprocessor = data_transform.initiate_data_transform(raw_path, split_path)
     model_trainer = ModelTrainer()
     model_path = model_trainer.initiate_model_training(train_data, test_data)
     print('Working Fine')
\ No newline at end of file
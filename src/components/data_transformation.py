@@ -1,14 +1,17 @@
 import os, sys
 from src.exception import CustomException
-from src.logger import logging
-from src.utlility import saveObject, globe_distance, fetch_redis, redis_connect, add_time_feature
+from src.logger import logging, lazy
+from src.utlility import saveObject, globe_distance, read_split
+from src.components.metadata import MetadataProvider
+from src.components.time_feature import TimeFeature
+from src.components.category_encoder import CategoryCodeEncoder
 
 import numpy as np
 import pandas as pd
 
 from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
-from sklearn.preprocessing import StandardScaler, OrdinalEncoder
+from sklearn.preprocessing import StandardScaler
 from sklearn.compose import ColumnTransformer
 from dataclasses import dataclass
 
@@ -18,25 +21,20 @@ from dataclasses import dataclass
 @dataclass
 class DataTransformConfig:
     preprocessor_obj_path = os.path.join('artifacts', 'preprocessor.joblib')
+    target_col_name = 'Time_taken (min)'
 
 
 
 @dataclass
 class DataTransform:
     config = DataTransformConfig()
-    r = redis_connect(
-        host = 'delivery-time-info.redis.cache.windows.net',
-        port = 6380,
-        db =0,
-        password = 'g1ohvaqFaRceQYOUFfG14fPOh6rp1JuoNAzCaHTjM9s=',
-        ssl = True,
-        decode_responses = True
-    )
+    metadata = MetadataProvider()
 
 
     def build_pipeline(self):
         try:
             logging.info('Build Pipeline Initiated')
+            info = self.metadata.get()
 
             
             # Numerical Pipeline
@@ -52,32 +50,39 @@ class DataTransform:
             # Categorical Pipeline
 
             categories = [
-                fetch_redis(self.r, 'categories-personID'),
-                fetch_redis(self.r, 'categories-weather'),
-                fetch_redis(self.r, 'categories-traffic'),
-                fetch_redis(self.r, 'categories-order'),
-                fetch_redis(self.r, 'categories-vehicle'),
-                fetch_redis(self.r, 'categories-festival'),
-                fetch_redis(self.r, 'categories-city'),
+                info['personID'],
+                info['weather'],
+                info['traffic'],
+                info['order'],
+                info['vehicle'],
+                info['festival'],
+                info['city'],
                 ]
             
+            # Missing values are filled with the most frequent code inside the encoder
             cats_pipe = Pipeline(
                 steps = (
-                
-                ('imputer', SimpleImputer(strategy = 'most_frequent')),
-                ('ordinalencoder', OrdinalEncoder(categories = categories)),
+                ('encoder', CategoryCodeEncoder(categories = categories)),
                 ('scaler', StandardScaler())
                 )
             )
 
             logging.info('Categorical Pipeline Created')
 
-            preprocessor = ColumnTransformer(
+            columns = ColumnTransformer(
                 transformers = [
-                ('Num', nums_pipe, fetch_redis(self.r, 'numerical')),
-                ('Cat', cats_pipe, fetch_redis(self.r, 'categorical'))
+                ('Num', nums_pipe, info['numerical']),
+                ('Cat', cats_pipe, info['categorical'])
                 ]
             )
+
+            # order_hour is derived inside the preprocessor so serving reuses the fitted median gap
+            preprocessor = Pipeline(
+                steps = (
+                ('time', TimeFeature()),
+                ('columns', columns)
+                )
+            )
             logging.info('Build Pipeline Successful')
 
             return preprocessor
@@ -88,70 +93,87 @@ class DataTransform:
             raise CustomException(e, sys)
     
 
-    def initiate_data_transform(self, train_path, test_path):
-        try:
-            train_df = pd.read_csv(train_path)
-            test_df = pd.read_csv(test_path)
-
-            # adding Column
-            add_time_feature(train_df)
-            add_time_feature(test_df)
-
-            # adding distance column
-            train_df['distance_rest_deliv'] = globe_distance(
-                data = train_df, 
-                x1 = 'Restaurant_latitude', 
-                y1 = 'Restaurant_longitude', 
-                x2 = 'Delivery_location_latitude', 
-                y2 = 'Delivery_location_longitude'
-                )
-            
-            test_df['distance_rest_deliv'] = globe_distance(
-                data = test_df, 
-                x1 = 'Restaurant_latitude', 
-                y1 = 'Restaurant_longitude', 
-                x2 = 'Delivery_location_latitude', 
-                y2 = 'Delivery_location_longitude'
-                )
-            
+    def input_columns(self) -> list:
+        '''Raw columns the preprocessor and target need, everything else stays on disk.'''
+        info = self.metadata.get()
+        engineered = ('order_hour', 'distance_rest_deliv')
+        return list(dict.fromkeys(
+            [col for col in info['numerical'] if col not in engineered] + info['categorical'] + [
+                'Time_Orderd', 'Time_Order_picked',
+                'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude',
+                self.config.target_col_name
+            ]
+        ))
+
+    def load_features(self, raw_data_path, split_index_path) -> tuple:
+        '''Feature engineering stage, returns the (train, test) DataFrames.'''
+        train_df, test_df = read_split(raw_data_path, split_index_path, columns = self.input_columns(), categorical = self.metadata.get()['categorical'])
+
+        # adding distance column
+        train_df['distance_rest_deliv'] = globe_distance(
+            data = train_df, 
+            x1 = 'Restaurant_latitude', 
+            y1 = 'Restaurant_longitude', 
+            x2 = 'Delivery_location_latitude', 
+            y2 = 'Delivery_location_longitude'
+            )
+        
+        test_df['distance_rest_deliv'] = globe_distance(
+            data = test_df, 
+            x1 = 'Restaurant_latitude', 
+            y1 = 'Restaurant_longitude', 
+            x2 = 'Delivery_location_latitude', 
+            y2 = 'Delivery_location_longitude'
+            )
+        
 
-            logging.info('Train Test Data Loaded Succesful')
-            logging.info(f'Train DataFrame: \n{train_df.head(3).to_string()}')
-            logging.info(f'Test DataFrame: \n{test_df.head(3).to_string()}')
-            
-            target_col_name = 'Time_taken (min)'
-            drop_columns = ['ID']
+        logging.info('Train Test Data Loaded Succesful')
+        logging.debug('Train DataFrame: \n%s', lazy(lambda: train_df.head(3).to_string()))
+        logging.debug('Test DataFrame: \n%s', lazy(lambda: test_df.head(3).to_string()))
+        return train_df, test_df
 
-            features_train_data = train_df.drop(columns = drop_columns, axis = 1)
-            target_train_data = train_df[target_col_name]
+    def fit_transform(self, train_df: pd.DataFrame, test_df: pd.DataFrame) -> tuple:
+        '''Preprocessor fit stage, returns (preprocessor, train_data, test_data) with the target as last column.'''
+        target_col_name = self.config.target_col_name
 
-            features_test_data = test_df.drop(columns = drop_columns, axis = 1)
-            target_test_data = test_df[target_col_name]
+        features_train_data = train_df
+        target_train_data = train_df[target_col_name]
 
+        features_test_data = test_df
+        target_test_data = test_df[target_col_name]
 
-            preprocessor = self.build_pipeline()
-            logging.info('Pipeline Loaded Successful')
 
+        preprocessor = self.build_pipeline()
+        logging.info('Pipeline Loaded Successful')
 
-            preprocessor.fit(features_train_data)
 
-            transform_feature_train_data = preprocessor.transform(features_train_data)
-            transform_feature_test_data = preprocessor.transform(features_test_data)
+        preprocessor.fit(features_train_data)
 
-            logging.info('Data Transformation Successful')
+        transform_feature_train_data = preprocessor.transform(features_train_data)
+        transform_feature_test_data = preprocessor.transform(features_test_data)
 
-            train_data = np.c_[transform_feature_train_data, np.array(target_train_data)]
-            test_data = np.c_[transform_feature_test_data, np.array(target_test_data)]
+        logging.info('Data Transformation Successful')
 
-            saveObject(
-                file_path = self.config.preprocessor_obj_path,
-                obj = preprocessor
-            )
+        train_data = np.c_[transform_feature_train_data, np.array(target_train_data)]
+        test_data = np.c_[transform_feature_test_data, np.array(target_test_data)]
+        return preprocessor, train_data, test_data
+
+    def save_preprocessor(self, preprocessor) -> str:
+        saveObject(
+            file_path = self.config.preprocessor_obj_path,
+            obj = preprocessor
+        )
+        return self.config.preprocessor_obj_path
+
+    def initiate_data_transform(self, raw_data_path, split_index_path):
+        try:
+            train_df, test_df = self.load_features(raw_data_path, split_index_path)
+            preprocessor, train_data, test_data = self.fit_transform(train_df, test_df)
 
             return (
                 train_data,
                 test_data,
-                self.config.preprocessor_obj_path
+                self.save_preprocessor(preprocessor)
             )
 
         except Exception as e:
@@ -0,0 +1,193 @@
+import os, sys
+import json
+import hashlib
+import shutil
+import zipfile
+import zlib
+from src.exception import CustomException
+from src.logger import logging
+
+from dataclasses import dataclass
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = b'PK\x03\x04'
+
+
+@dataclass
+class DatasetCacheConfig:
+    cache_dir = os.path.join('artifacts', 'downloads')
+    chunk_size: int = 1 << 20
+    timeout: float = float(os.environ.get('DATASET_FETCH_TIMEOUT', 30))
+
+
+@dataclass
+class Decompressor:
+    '''Streams gzip bodies through zlib as they arrive, other bodies pass through.\n
+        Zip archives need their central directory at the end of the file and are
+        extracted once the download is complete.'''
+
+    kind: str = None
+    decoder: object = None
+
+    def feed(self, data: bytes) -> bytes:
+        if self.kind is None:
+            self.kind = 'gzip' if data.startswith(GZIP_MAGIC) else 'zip' if data.startswith(ZIP_MAGIC) else 'plain'
+            if self.kind == 'gzip':
+                self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        if self.kind != 'gzip':
+            return data if self.kind == 'plain' else b''
+
+        out = self.decoder.decompress(data)
+        # Concatenated gzip members, as written by e.g. `cat a.gz b.gz`
+        while self.decoder.eof and self.decoder.unused_data:
+            rest = self.decoder.unused_data
+            self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            out += self.decoder.decompress(rest)
+        return out
+
+    def truncated(self) -> bool:
+        return self.kind == 'gzip' and not self.decoder.eof
+
+    def flush(self) -> bytes:
+        return self.decoder.flush() if self.kind == 'gzip' else b''
+
+
+@dataclass
+class DatasetCache:
+    '''Local copy of remote datasets, keyed by URL.\n
+        The body is streamed to disk chunk by chunk, decompressed on the fly, and
+        revalidated with If-None-Match / If-Modified-Since on the next fetch, so an
+        unchanged source costs one 304. An interrupted download is resumed with a
+        Range request guarded by If-Range. Local paths are returned unchanged.'''
+
+    config = DatasetCacheConfig()
+
+    def entry_dir(self, url: str) -> str:
+        return os.path.join(self.config.cache_dir, hashlib.sha256(url.encode()).hexdigest())
+
+    def read_meta(self, entry_dir: str) -> dict:
+        try:
+            with open(os.path.join(entry_dir, 'meta.json')) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def write_meta(self, entry_dir: str, meta: dict) -> None:
+        tmp_path = os.path.join(entry_dir, f'meta.json.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, os.path.join(entry_dir, 'meta.json'))
+
+    def fetch(self, url: str) -> str:
+        '''Returns a local file path holding the (decompressed) content of url.'''
+        if not url.startswith(('http://', 'https://')):
+            return url
+
+        try:
+            entry_dir = self.entry_dir(url)
+            os.makedirs(entry_dir, exist_ok = True)
+            data_path = os.path.join(entry_dir, 'data')
+            partial_path = os.path.join(entry_dir, 'partial')
+            meta = self.read_meta(entry_dir)
+
+            headers = {}
+            validator = meta.get('etag') or meta.get('last_modified')
+            resume_from = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+
+            if meta.get('complete') and os.path.exists(data_path):
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+            elif resume_from and validator:
+                headers['Range'] = f'bytes={resume_from}-'
+                headers['If-Range'] = validator
+            else:
+                resume_from = 0
+
+            try:
+                response = urlopen(Request(url, headers = headers), timeout = self.config.timeout)
+            except HTTPError as e:
+                if e.code == 304:
+                    logging.info(f'Dataset {url} not modified, using {data_path}')
+                    return data_path
+                if e.code == 416:
+                    # Partial file no longer matches the source, start over
+                    os.remove(partial_path)
+                    return self.fetch(url)
+                raise
+
+            with response:
+                if response.status != 206:
+                    resume_from = 0
+                meta = {
+                    'url': url,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'complete': False
+                }
+                self.write_meta(entry_dir, meta)
+                logging.info(f'Dataset Download {url} {"resumed at byte " + str(resume_from) if resume_from else "started"}')
+                kind = self.download(response, partial_path, data_path, resume_from)
+
+            if kind == 'zip':
+                self.extract_zip(partial_path, data_path)
+            os.remove(partial_path)
+
+            self.write_meta(entry_dir, {**meta, 'complete': True, 'kind': kind})
+            logging.info(f'Dataset Download {url} complete at {data_path}')
+            return data_path
+
+        except Exception as e:
+            logging.error(f'FAILED Dataset Fetch {url}')
+            logging.error(e)
+            raise CustomException(e, sys)
+
+    def download(self, response, partial_path: str, data_path: str, resume_from: int) -> str:
+        '''Appends the body to the raw partial file and writes the decompressed stream.\n
+            On resume the bytes already on disk are replayed through the decompressor
+            first. Returns the detected kind: gzip, zip or plain.'''
+        decompressor = Decompressor()
+        tmp_path = f'{data_path}.{os.getpid()}.tmp'
+
+        try:
+            with open(partial_path, 'ab' if resume_from else 'wb') as partial, open(tmp_path, 'wb') as out:
+                if resume_from:
+                    with open(partial_path, 'rb') as previous:
+                        for block in iter(lambda: previous.read(self.config.chunk_size), b''):
+                            out.write(decompressor.feed(block))
+
+                expected, received = response.headers.get('Content-Length'), 0
+                for block in iter(lambda: response.read(self.config.chunk_size), b''):
+                    partial.write(block)
+                    out.write(decompressor.feed(block))
+                    received += len(block)
+
+                # A dropped connection ends the body early without an error, the partial file is kept for a resume
+                if expected is not None and received < int(expected) or decompressor.truncated():
+                    raise ConnectionError(f'Download interrupted after {resume_from + received} bytes')
+                out.write(decompressor.flush())
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+        if decompressor.kind == 'zip':
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, data_path)
+        return decompressor.kind or 'plain'
+
+    def extract_zip(self, zip_path: str, data_path: str) -> None:
+        '''Copies the single data member of the archive out in blocks.'''
+        tmp_path = f'{data_path}.{os.getpid()}.tmp'
+        with zipfile.ZipFile(zip_path) as archive:
+            members = [info for info in archive.infolist() if not info.is_dir() and not info.filename.startswith('__MACOSX/')]
+            if len(members) != 1:
+                raise ValueError(f'Expected one file in the zip archive, found {len(members)}')
+            with archive.open(members[0]) as member, open(tmp_path, 'wb') as out:
+                shutil.copyfileobj(member, out, self.config.chunk_size)
+        os.replace(tmp_path, data_path)
@@ -0,0 +1,193 @@
+import os, sys
+import time
+from src.exception import CustomException
+from src.logger import logging
+from src.utlility import saveObject, loadObject, globe_distance, file_lock
+from src.artifact_cache import file_sha256
+from src.components.cv_engine import SufficientStatistics, solve_estimator
+from src.components.model_selection import candidate_grid
+from src.components.model_export import ModelExport
+
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+
+class MissingStatistics(Exception):
+    '''The published model has no statistics to update, only a full training can replace it.'''
+
+
+class InvalidDeliveries(ValueError):
+    '''The appended rows lack a column the preprocessor needs or hold values it cannot encode.'''
+
+
+# Inputs of globe_distance, distance_rest_deliv is computed from them
+LOCATION_COLUMNS = ('Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude')
+
+
+@dataclass
+class IncrementalTrainerConfig:
+    stats_path = os.path.join('artifacts', 'model_stats.npz')
+    lock_path = os.path.join('artifacts', 'model_stats.lock')
+    preprocessor_path = os.path.join('artifacts', 'preprocessor.joblib')
+    model_path = os.path.join('artifacts', 'model.joblib')
+    target_col_name = 'Time_taken (min)'
+
+
+def column_scalers(preprocessor) -> list:
+    '''(columns, pipe without its scaler, scaler) per ColumnTransformer branch, in output column order.'''
+    branches = [(columns, pipe) for name, pipe, columns in preprocessor.named_steps['columns'].transformers_ if name != 'remainder']
+    for columns, pipe in branches:
+        if not hasattr(pipe, 'steps') or not hasattr(pipe.steps[-1][1], 'scale_'):
+            raise ValueError('Incremental updates need every preprocessor branch to end in a StandardScaler')
+    return [(columns, pipe[:-1], pipe.steps[-1][1]) for columns, pipe in branches]
+
+
+def scaler_arrays(preprocessor) -> tuple:
+    '''(mean, scale) of all scalers, concatenated in the order of the transformed columns.'''
+    scalers = [scaler for _, _, scaler in column_scalers(preprocessor)]
+    return np.concatenate([scaler.mean_ for scaler in scalers]), np.concatenate([scaler.scale_ for scaler in scalers])
+
+
+@dataclass
+class IncrementalTrainer:
+    '''Updates the published model from newly completed deliveries only.\n
+        The training rows are kept as sufficient statistics (row count, sums, X^T X,
+        X^T y) of the preprocessor output before scaling, in artifacts/model_stats.npz.
+        An append adds the statistics of the new rows, refits every StandardScaler from
+        them, standardizes the statistics with the new scalers and re-solves the model
+        with its selected alpha, all on p x p matrices. The imputer fills, category
+        lists and order time gap stay as fitted, and alpha is only re-selected by a full
+        /train.'''
+
+    config = IncrementalTrainerConfig()
+
+    @staticmethod
+    def initial_statistics(preprocessor, train_data: np.ndarray) -> SufficientStatistics:
+        '''Statistics of the training rows, recovered from the scaled train_data (target as last column).'''
+        mean, scale = scaler_arrays(preprocessor)
+        return SufficientStatistics.from_data(train_data[:, :-1] * scale + mean, train_data[:, -1])
+
+    def save_statistics(self, stats: SufficientStatistics, model_path: str) -> str:
+        '''Writes the statistics together with the hash of the model they produced.'''
+        tmp_path = f'{self.config.stats_path}.{os.getpid()}.tmp.npz'
+        np.savez(
+            tmp_path,
+            n = stats.n, sum_x = stats.sum_x, sum_y = stats.sum_y, xtx = stats.xtx, xty = stats.xty, yty = stats.yty,
+            model_sha256 = file_sha256(model_path)
+        )
+        os.replace(tmp_path, self.config.stats_path)
+        logging.info(f'Model Statistics of {int(stats.n)} rows Saved at {self.config.stats_path}')
+        return self.config.stats_path
+
+    def load_statistics(self, model_path: str) -> SufficientStatistics:
+        if not os.path.exists(self.config.stats_path):
+            raise MissingStatistics(f'No model statistics at {self.config.stats_path}, run a full training first')
+        with np.load(self.config.stats_path) as npz:
+            if str(npz['model_sha256']) != file_sha256(model_path):
+                raise MissingStatistics('The model was replaced without its statistics, run a full training first')
+            return SufficientStatistics(
+                float(npz['n']), npz['sum_x'], float(npz['sum_y']), npz['xtx'], npz['xty'], float(npz['yty'])
+            )
+
+    @staticmethod
+    def required_columns(preprocessor) -> list:
+        '''Raw columns an appended row must have, order_hour and distance_rest_deliv are derived.'''
+        time = preprocessor.named_steps['time']
+        branch_columns = [col for columns, _, _ in column_scalers(preprocessor) for col in columns]
+        return list(dict.fromkeys(
+            [col for col in branch_columns if col not in ('order_hour', 'distance_rest_deliv')]
+            + [time.ordered_col, time.picked_col, *LOCATION_COLUMNS]
+        ))
+
+    def unscaled_features(self, preprocessor, data: pd.DataFrame) -> np.ndarray:
+        '''Preprocessor output of data before the scalers, the space the statistics live in.'''
+        data = data.copy()
+        data['distance_rest_deliv'] = globe_distance(
+            data = data,
+            x1 = 'Restaurant_latitude',
+            y1 = 'Restaurant_longitude',
+            x2 = 'Delivery_location_latitude',
+            y2 = 'Delivery_location_longitude'
+            )
+        data = preprocessor.named_steps['time'].transform(data)
+        return np.hstack([
+            np.asarray(pipe.transform(data[columns]), dtype = np.float64)
+            for columns, pipe, _ in column_scalers(preprocessor)
+        ])
+
+    @staticmethod
+    def refit_scalers(preprocessor, stats: SufficientStatistics) -> None:
+        '''Sets every StandardScaler to the mean and population variance of all rows so far.'''
+        mean = stats.sum_x / stats.n
+        var = np.maximum(np.diag(stats.xtx) / stats.n - mean ** 2, 0.0)
+        start = 0
+        for _, _, scaler in column_scalers(preprocessor):
+            end = start + len(scaler.mean_)
+            scaler.mean_, scaler.var_ = mean[start:end], var[start:end]
+            # Constant columns keep a unit scale, as StandardScaler does
+            scaler.scale_ = np.where(var[start:end] > 0, np.sqrt(var[start:end]), 1.0)
+            scaler.n_samples_seen_ = int(stats.n)
+            start = end
+
+    @staticmethod
+    def resolve(model, stats: SufficientStatistics) -> None:
+        '''Re-solves model in place with its selected alpha from standardized statistics.'''
+        estimator, _, cv = candidate_grid(model)
+        if cv is None:
+            alpha = model.alpha
+        else:
+            alpha = model.alpha_
+            if hasattr(model, 'l1_ratio_'):
+                estimator.set_params(l1_ratio = model.l1_ratio_)
+        coef, intercept = solve_estimator(stats, estimator, alpha, np.ravel(model.coef_).astype(np.float64))
+        model.coef_, model.intercept_ = coef, float(intercept)
+
+    def append(self, data: pd.DataFrame) -> dict:
+        '''Folds the completed deliveries in data into the published preprocessor, model, kernel and statistics.'''
+        start = time.perf_counter()
+        target = pd.to_numeric(data[self.config.target_col_name], errors = 'coerce')
+        data = data[target.notna()]
+        skipped = int(target.isna().sum())
+
+        with file_lock(self.config.lock_path):
+            preprocessor = loadObject(self.config.preprocessor_path)
+            model = loadObject(self.config.model_path)
+            stats = self.load_statistics(self.config.model_path)
+
+            if len(data):
+                missing = [col for col in self.required_columns(preprocessor) if col not in data]
+                if missing:
+                    raise InvalidDeliveries(f'Missing columns: {", ".join(missing)}')
+                try:
+                    Z = self.unscaled_features(preprocessor, data)
+                except (KeyError, ValueError, TypeError) as e:
+                    raise InvalidDeliveries(f'Deliveries could not be encoded: {e}') from e
+                stats = stats + SufficientStatistics.from_data(Z, target[target.notna()].to_numpy(dtype = np.float64))
+
+                self.refit_scalers(preprocessor, stats)
+                self.resolve(model, stats.standardized(*scaler_arrays(preprocessor)))
+
+                saveObject(self.config.preprocessor_path, preprocessor)
+                saveObject(self.config.model_path, model)
+                self.save_statistics(stats, self.config.model_path)
+                ModelExport().initiate_model_export(self.config.preprocessor_path, self.config.model_path)
+
+        report = {
+            'rows': len(data),
+            'skipped': skipped,
+            'total_rows': int(stats.n),
+            'seconds': round(time.perf_counter() - start, 4),
+            'model_sha256': file_sha256(self.config.model_path)
+        }
+        logging.info(f'Incremental Update: {report}')
+        return report
+
+    def initiate_incremental_update(self, data: pd.DataFrame) -> dict:
+        try:
+            return self.append(data)
+
+        except Exception as e:
+            logging.error('Incremental Update Failed')
+            logging.error(e)
+            raise CustomException(e, sys)
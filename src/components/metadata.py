@@ -0,0 +1,147 @@
+import os, sys
+import json
+import threading
+import time
+from src.exception import CustomException
+from src.logger import logging
+from src.utlility import RedisConfig, redis_connect
+from src.metrics import span
+
+from dataclasses import dataclass, field, asdict
+from typing import Any
+
+
+# Snapshot name (data-info.json layout) -> Redis list key
+METADATA_KEYS = {
+    'categorical': 'categorical',
+    'numerical': 'numerical',
+    'personID': 'categories-personID',
+    'weather': 'categories-weather',
+    'traffic': 'categories-traffic',
+    'order': 'categories-order',
+    'vehicle': 'categories-vehicle',
+    'festival': 'categories-festival',
+    'city': 'categories-city',
+}
+
+
+@dataclass
+class MetadataConfig:
+    snapshot_path = os.path.join('artifacts', 'metadata-snapshot.json')
+    # Bundled copy used when there is neither Redis nor a snapshot
+    seed_path = os.path.join('artifacts', 'data-info.json')
+    ttl: float = float(os.environ.get('METADATA_TTL', 3600))
+    socket_timeout: float = 2.0
+
+
+@dataclass
+class MetadataProvider:
+    '''Column lists and categories for the preprocessor.\n
+        Nothing touches the network until get() is called. A snapshot younger than
+        the TTL is used as is, a stale one is returned immediately while a background
+        thread refreshes it, and Redis is only waited on when no snapshot exists.
+        All keys come back in one pipelined round trip.'''
+
+    config: MetadataConfig = field(default_factory = MetadataConfig)
+    redis_config: RedisConfig = field(default_factory = RedisConfig)
+    connection: Any = None
+    lock: threading.Lock = field(default_factory = threading.Lock, repr = False)
+    refreshing: bool = False
+
+    def connect(self):
+        if self.connection is None:
+            from redis.retry import Retry
+            from redis.backoff import NoBackoff
+
+            # Fail fast, the snapshot is the fallback rather than retrying
+            self.connection = redis_connect(
+                **asdict(self.redis_config),
+                decode_responses = True,
+                socket_timeout = self.config.socket_timeout,
+                socket_connect_timeout = self.config.socket_timeout,
+                retry = Retry(NoBackoff(), 0)
+            )
+        return self.connection
+
+    def fetch(self) -> dict:
+        logging.info('Try Fetch Metadata Redis Cloud')
+        pipe = self.connect().pipeline(transaction = False)
+        for key in METADATA_KEYS.values():
+            pipe.lrange(key, 0, -1)
+        with span('redis.pipeline'):
+            values = pipe.execute()
+        logging.info('Successful Fetch Metadata Redis Cloud')
+        return dict(zip(METADATA_KEYS, values))
+
+    def read_snapshot(self) -> dict:
+        try:
+            with open(self.config.snapshot_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def write_snapshot(self, data: dict, stale: bool = False) -> dict:
+        '''A stale snapshot is served as is and refreshed in the background on the next get().'''
+        previous = self.read_snapshot() or {}
+        changed = any(previous.get(name) != data[name] for name in METADATA_KEYS)
+        snapshot = {
+            **{name: data[name] for name in METADATA_KEYS},
+            'version': previous.get('version', 0) + changed,
+            'fetched_at': 0.0 if stale else time.time()
+        }
+
+        os.makedirs(os.path.dirname(self.config.snapshot_path), exist_ok = True)
+        tmp_path = f'{self.config.snapshot_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(snapshot, file)
+        os.replace(tmp_path, self.config.snapshot_path)
+        logging.info(f'Metadata Snapshot version {snapshot["version"]} Saved at {self.config.snapshot_path}')
+        return snapshot
+
+    def refresh(self) -> dict:
+        try:
+            return self.write_snapshot(self.fetch())
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+    def refresh_in_background(self) -> None:
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.warning('Background Metadata Refresh Failed, keeping snapshot')
+                logging.warning(e)
+
+        threading.Thread(target = run, daemon = True).start()
+
+    def get(self) -> dict:
+        try:
+            snapshot = self.read_snapshot()
+
+            if snapshot is not None:
+                if time.time() - snapshot.get('fetched_at', 0) >= self.config.ttl:
+                    self.refresh_in_background()
+                return snapshot
+
+            with self.lock:
+                self.refreshing = True
+            try:
+                return self.refresh()
+            except Exception as e:
+                logging.warning('Metadata Fetch Failed, falling back to seed file')
+                logging.warning(e)
+                with open(self.config.seed_path) as file:
+                    seed = json.load(file)
+                # Saved stale, later calls use it at once instead of waiting on Redis again
+                return self.write_snapshot(seed, stale = True)
+
+        except Exception as e:
+            logging.error('FAILED Metadata Load')
+            logging.error(e)
+            raise CustomException(e, sys)
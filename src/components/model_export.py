@@ -0,0 +1,90 @@
+import os, sys
+from src.exception import CustomException
+from src.logger import logging
+from src.utlility import loadObject
+from src.components.category_encoder import UNKNOWN_CODE
+
+import numpy as np
+from dataclasses import dataclass
+
+
+@dataclass
+class ModelExportConfig:
+    kernel_file_path = os.path.join('artifacts', 'model_kernel.npz')
+
+
+def fold_pipeline(preprocessor, model) -> dict:
+    '''Folds the fitted preprocessor and linear model into flat float32 arrays.\n
+        TimeFeature:  median order-to-pickup gap, order_hour is recomputed by the predictor\n
+        Numerical:   coef * (x - mean) / scale  ->  weight * x  (+ constant folded into bias)\n
+        Categorical: coef * (code - mean) / scale  ->  one table value per category, plus the fill and unknown codes'''
+
+    coef = np.ravel(model.coef_).astype(np.float64)
+    bias = float(np.ravel(model.intercept_)[0]) if np.ndim(model.intercept_) else float(model.intercept_)
+
+    time_feature, columns = preprocessor.named_steps['time'], preprocessor.named_steps['columns']
+    transformers = {name: (pipe, columns) for name, pipe, columns in columns.transformers_ if name != 'remainder'}
+    if set(transformers) != {'Num', 'Cat'}:
+        raise ValueError(f'Unsupported preprocessor layout {sorted(transformers)}')
+
+    num_pipe, num_columns = transformers['Num']
+    cat_pipe, cat_columns = transformers['Cat']
+    num_coef, cat_coef = coef[:len(num_columns)], coef[len(num_columns):]
+
+    # Numerical columns
+    imputer, scaler = num_pipe.named_steps['imputer'], num_pipe.named_steps['scaling']
+    num_fill = imputer.statistics_
+    num_weight = num_coef / scaler.scale_
+    bias -= float(np.dot(num_weight, scaler.mean_))
+
+    # Categorical columns, one contiguous slice of the table per column
+    encoder, scaler = cat_pipe.named_steps['encoder'], cat_pipe.named_steps['scaler']
+    cat_values, cat_table, cat_offsets, cat_missing, cat_unknown = [], [], [0], [], []
+    for k, categories in enumerate(encoder.categories_):
+        codes = np.arange(len(categories), dtype = np.float64)
+        table = cat_coef[k] * (codes - scaler.mean_[k]) / scaler.scale_[k]
+        cat_values.extend(str(category) for category in categories)
+        cat_table.extend(table)
+        cat_offsets.append(len(cat_values))
+        cat_missing.append(table[encoder.fill_codes_[k]])
+        cat_unknown.append(cat_coef[k] * (UNKNOWN_CODE - scaler.mean_[k]) / scaler.scale_[k])
+
+    return {
+        'num_columns': np.array(num_columns, dtype = str),
+        'num_fill': num_fill.astype(np.float32),
+        'num_weight': num_weight.astype(np.float32),
+        'cat_columns': np.array(cat_columns, dtype = str),
+        'cat_values': np.array(cat_values, dtype = str),
+        'cat_table': np.array(cat_table, dtype = np.float32),
+        'cat_offsets': np.array(cat_offsets, dtype = np.int32),
+        'cat_missing': np.array(cat_missing, dtype = np.float32),
+        'cat_unknown': np.array(cat_unknown, dtype = np.float32),
+        'bias': np.array([bias], dtype = np.float32),
+        'time_columns': np.array([time_feature.ordered_col, time_feature.picked_col], dtype = str),
+        'median_gap': np.array([time_feature.median_gap_], dtype = np.float32),
+    }
+
+
+@dataclass
+class ModelExport:
+    config = ModelExportConfig()
+
+    def initiate_model_export(self, preprocessor_path: str, model_path: str) -> str:
+        try:
+            logging.info('Model Export Initiated')
+
+            bundle = fold_pipeline(loadObject(preprocessor_path), loadObject(model_path))
+
+            os.makedirs(os.path.dirname(self.config.kernel_file_path), exist_ok = True)
+            tmp_path = f'{self.config.kernel_file_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as file:
+                np.savez(file, **bundle)
+            os.replace(tmp_path, self.config.kernel_file_path)
+
+            logging.info(f'Model Kernel Saved at {self.config.kernel_file_path}')
+            return self.config.kernel_file_path
+
+        except Exception as e:
+            logging.error('FAILED Model Export')
+            logging.error(e)
+            raise CustomException(e, sys)
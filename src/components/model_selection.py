@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+from src.logger import logging
+
+import numpy as np
+from joblib import Parallel, delayed, dump, load
+from sklearn.base import clone
+from sklearn.linear_model import Lasso, Ridge, ElasticNet, LassoCV, RidgeCV, ElasticNetCV, enet_path
+from sklearn.model_selection import KFold
+
+
+def candidate_grid(model) -> tuple:
+    '''Returns (base estimator, alphas, cv) for a *CV estimator, (model, [None], None) otherwise.'''
+    if isinstance(model, LassoCV):
+        base = Lasso(max_iter = model.max_iter, tol = model.tol, precompute = True)
+    elif isinstance(model, ElasticNetCV):
+        base = ElasticNet(l1_ratio = model.l1_ratio, max_iter = model.max_iter, tol = model.tol, precompute = True)
+    elif isinstance(model, RidgeCV):
+        base = Ridge()
+    else:
+        return model, [None], None
+    cv = model.cv if isinstance(model.cv, int) else 5
+    return base, list(model.alphas), cv
+
+
+def with_alpha(estimator, alpha):
+    estimator = clone(estimator)
+    return estimator if alpha is None else estimator.set_params(alpha = alpha)
+
+
+def fold_scores(estimator, alphas: list, X: np.ndarray, y: np.ndarray, train_idx: np.ndarray, val_idx: np.ndarray) -> list:
+    '''Validation MSE of one (model, fold) for every alpha, X/y arrive as memory maps.\n
+        Lasso/ElasticNet walk the whole alpha path on one precomputed Gram matrix,
+        like the *CV estimators do, other models are refit per alpha.'''
+    X_fold, y_fold, X_val, y_val = X[train_idx], y[train_idx], X[val_idx], y[val_idx]
+
+    if isinstance(estimator, ElasticNet):
+        x_mean, y_mean = X_fold.mean(axis = 0), y_fold.mean()
+        X_fold = X_fold - x_mean
+        y_fold = y_fold - y_mean
+        path_alphas = sorted(alphas, reverse = True)
+        _, coefs, _ = enet_path(
+            X_fold, y_fold,
+            l1_ratio = estimator.l1_ratio,
+            alphas = path_alphas,
+            precompute = X_fold.T @ X_fold,
+            Xy = X_fold.T @ y_fold,
+            max_iter = estimator.max_iter,
+            tol = estimator.tol
+        )
+        errors = y_val[:, None] - ((X_val - x_mean) @ coefs + y_mean)
+        scores = dict(zip(path_alphas, np.mean(np.square(errors), axis = 0).tolist()))
+        return [scores[alpha] for alpha in alphas]
+
+    return [
+        float(np.mean(np.square(y_val - with_alpha(estimator, alpha).fit(X_fold, y_fold).predict(X_val))))
+        for alpha in alphas
+    ]
+
+
+def refit(estimator, alpha, X: np.ndarray, y: np.ndarray):
+    return with_alpha(estimator, alpha).fit(X, y)
+
+
+def parallel_model_selection(X_train: np.ndarray, y_train: np.ndarray, models: dict, n_jobs: int = -1) -> dict:
+    '''Cross-validates every (model, fold) over its alpha grid on a process pool and returns {name: fitted best estimator}.\n
+        X_train/y_train are dumped once to a memory-mapped file, workers map it
+        instead of receiving a pickled copy.'''
+
+    folder = tempfile.mkdtemp(prefix = 'model-selection-')
+    try:
+        dump((np.ascontiguousarray(X_train), np.ascontiguousarray(y_train)), os.path.join(folder, 'train.joblib'))
+        X, y = load(os.path.join(folder, 'train.joblib'), mmap_mode = 'r')
+
+        grids = {name: candidate_grid(model) for name, model in models.items()}
+        tasks = [
+            (name, train_idx, val_idx)
+            for name, (_, alphas, cv) in grids.items() if cv is not None
+            for train_idx, val_idx in KFold(n_splits = cv).split(X)
+        ]
+
+        with Parallel(n_jobs = n_jobs, max_nbytes = None) as parallel:
+            scores = parallel(
+                delayed(fold_scores)(grids[name][0], grids[name][1], X, y, train_idx, val_idx)
+                for name, train_idx, val_idx in tasks
+            )
+
+            cv_mse = {}
+            for (name, _, _), fold in zip(tasks, scores):
+                for alpha, score in zip(grids[name][1], fold):
+                    cv_mse.setdefault(name, {}).setdefault(alpha, []).append(score)
+
+            best_alpha = {
+                name: min(cv_mse[name], key = lambda alpha: np.mean(cv_mse[name][alpha])) if name in cv_mse else None
+                for name in grids
+            }
+            logging.info(f'Parallel Model Selection best alphas: {best_alpha}')
+
+            fitted = parallel(delayed(refit)(grids[name][0], best_alpha[name], X, y) for name in grids)
+
+        return dict(zip(grids, fitted))
+
+    finally:
+        shutil.rmtree(folder, ignore_errors = True)
+
+
+def stratified_order(y: np.ndarray, bins: int = 10, random_state: int = 7) -> np.ndarray:
+    '''Row order whose every prefix is a stratified sample of y-quantile bins.\n
+        Rows are shuffled within their bin and interleaved by their relative position
+        in it, so the first m rows hold about m / bins rows of each bin and a larger
+        subsample always contains the smaller ones.'''
+    rng = np.random.default_rng(random_state)
+    edges = np.quantile(y, np.linspace(0, 1, bins + 1)[1:-1])
+    strata = np.searchsorted(edges, y, side = 'right')
+
+    position = np.empty(len(y))
+    for stratum in np.unique(strata):
+        rows = np.flatnonzero(strata == stratum)
+        position[rng.permutation(rows)] = (np.arange(len(rows)) + rng.random(len(rows))) / len(rows)
+    return np.argsort(position, kind = 'stable')
+
+
+def halving_model_selection(X_train: np.ndarray, y_train: np.ndarray, models: dict, n_jobs: int = 1,
+                            min_rows: int = 2000, factor: int = 3, random_state: int = 7) -> dict:
+    '''Successive halving over every (model, alpha) candidate, returns {name: fitted best estimator}.\n
+        All candidates are cross-validated on a stratified subsample of min_rows rows,
+        the best 1 / factor of them by CV MSE move on to a subsample factor times larger,
+        and so on until the survivors are scored on every row of X_train or one is left.
+        Each model is refit on X_train with its best alpha from the last rung it reached,
+        so the report still has one row per model.'''
+    grids = {name: candidate_grid(model) for name, model in models.items()}
+    candidates = [(name, alpha) for name, (_, alphas, cv) in grids.items() if cv is not None for alpha in alphas]
+    order = stratified_order(y_train, random_state = random_state)
+
+    best_alpha = {name: None for name in grids}
+    rows = min(min_rows, len(y_train))
+    with Parallel(n_jobs = n_jobs) as parallel:
+        while candidates:
+            # Sorted back to the original row order, the subsample folds follow the full data folds
+            sample = np.sort(order[:rows])
+            X, y = X_train[sample], y_train[sample]
+
+            alive = {}
+            for name, alpha in candidates:
+                alive.setdefault(name, []).append(alpha)
+            tasks = [
+                (name, train_idx, val_idx)
+                for name in alive
+                for train_idx, val_idx in KFold(n_splits = grids[name][2]).split(X)
+            ]
+            scores = parallel(
+                delayed(fold_scores)(grids[name][0], alive[name], X, y, train_idx, val_idx)
+                for name, train_idx, val_idx in tasks
+            )
+
+            cv_mse = {}
+            for (name, _, _), fold in zip(tasks, scores):
+                for alpha, score in zip(alive[name], fold):
+                    cv_mse.setdefault((name, alpha), []).append(score)
+            ranked = sorted(candidates, key = lambda candidate: np.mean(cv_mse[candidate]))
+            for name in alive:
+                best_alpha[name] = next(alpha for model, alpha in ranked if model == name)
+            logging.info(f'Halving Model Selection {rows} rows, {len(candidates)} candidates, best {ranked[0]}')
+
+            candidates = ranked[:max(1, -(-len(ranked) // factor))]
+            if rows == len(y_train) or len(candidates) == 1:
+                break
+            rows = min(rows * factor, len(y_train))
+
+        logging.info(f'Halving Model Selection best alphas: {best_alpha}')
+        fitted = parallel(delayed(refit)(grids[name][0], best_alpha[name], X_train, y_train) for name in grids)
+
+    return dict(zip(grids, fitted))
@@ -9,66 +9,100 @@ from sklearn.linear_model import LassoCV, RidgeCV, ElasticNetCV
 from dataclasses import dataclass
 
 
+# Cross-validation results kept by the *CV estimators, never read by predict
+CV_ATTRIBUTES = ('mse_path_', 'alphas_', 'dual_gap_', 'n_iter_', 'cv_values_', 'cv_results_')
+
+
+def strip_cv_attributes(model):
+    '''Drops CV_ATTRIBUTES in place, the saved model keeps only what predict needs.'''
+    for name in CV_ATTRIBUTES:
+        if name in vars(model):
+            delattr(model, name)
+    return model
+
+
 @dataclass
 class ModelTrainerConfig:
     trained_model_file_path = os.path.join('artifacts', 'model.joblib')
+    # 'gram' (shared fold statistics), 'parallel' (process pool), 'halving' (successive halving
+    # on subsamples) or 'fit' (sequential *CV fits)
+    selection: str = os.environ.get('MODEL_SELECTION', 'gram')
+    # Worker processes for the 'parallel' selection, -1 uses every core
+    n_jobs: int = int(os.environ.get('TRAIN_N_JOBS', -1))
+    # Budget of the 'halving' selection: rows of the first subsample, and the factor by
+    # which the subsample grows and the candidates shrink at every rung
+    halving_min_rows: int = int(os.environ.get('HALVING_MIN_ROWS', 2000))
+    halving_factor: int = int(os.environ.get('HALVING_FACTOR', 3))
+    alphas: tuple = (1e-10, 1e-5, 1e-2, 1e-1, 0.5, 1, 2, 3, 5, 10, 20, 30, 40, 50)
+    cv: int = 5
 
 @dataclass
 class ModelTrainer:
     config = ModelTrainerConfig()
 
-    def initiate_model_training(self, train_data: np.array, test_data: np.array) -> str:
-        try:
-            
-            logging.info('Splitting Dependent and Independent Variable Train-Test Data')
-
-            X_train, X_test, y_train, y_test = (
-                train_data[:, :-1],
-                test_data[:, :-1],
-                train_data[:, -1],
-                test_data[:, -1]
-            )
-
-            alphas = [1e-10, 1e-5, 1e-2, 1e-1, 0.5, 1, 2, 3, 5, 10, 20, 30, 40, 50]
-            models = {
-                'Lasso': LassoCV(
-                            alphas = alphas, 
-                            cv = 5,
-                            ),
-                'Ridge': RidgeCV(
+    def build_models(self) -> dict:
+        alphas = list(self.config.alphas)
+        return {
+            'Lasso': LassoCV(
+                        alphas = alphas, 
+                        cv = self.config.cv,
+                        ),
+            'Ridge': RidgeCV(
+                        alphas = alphas, 
+                        cv = self.config.cv, 
+                        ),
+            'ElasticNet': ElasticNetCV(
                             alphas = alphas, 
-                            cv = 5, 
-                            ),
-                'ElasticNet': ElasticNetCV(
-                                alphas = alphas, 
-                                cv = 5, 
-                                )
-            }
-        
+                            cv = self.config.cv, 
+                            )
+        }
+
+    def halving_options(self) -> dict:
+        return {'min_rows': self.config.halving_min_rows, 'factor': self.config.halving_factor}
+
+    def select_model(self, train_data: np.array, test_data: np.array) -> tuple:
+        '''Model selection stage, returns (best model, report).'''
+        logging.info('Splitting Dependent and Independent Variable Train-Test Data')
+
+        X_train, X_test, y_train, y_test = (
+            train_data[:, :-1],
+            test_data[:, :-1],
+            train_data[:, -1],
+            test_data[:, -1]
+        )
+
+        models = self.build_models()
             
-            model_report = {}
-                
-            model_report = evalute_model(
-                                    X_train,
-                                    X_test,
-                                    y_train,
-                                    y_test,
-                                    models
-                                        )
-
-            logging.info(f'Model Report: \n{model_report}')
-            print('Model Reports:\n', model_report, '\n\n')
-
-
-            best_model_name = model_report.sort_values(by = 'R2Score', ascending = False).iloc[0,0]
-            print('Best Model:\n', model_report[model_report.ModelName == best_model_name], '\n\n')
-            best_model = models[best_model_name]
-
-            saveObject(
-                file_path = self.config.trained_model_file_path,
-                obj = best_model
-            )
-            return self.config.trained_model_file_path
+        model_report = evalute_model(
+                                X_train,
+                                X_test,
+                                y_train,
+                                y_test,
+                                models,
+                                selection = self.config.selection,
+                                n_jobs = self.config.n_jobs,
+                                halving = self.halving_options()
+                                    )
+
+        logging.info(f'Model Report: \n{model_report}')
+        print('Model Reports:\n', model_report, '\n\n')
+
+
+        best_model_name = model_report.sort_values(by = 'R2Score', ascending = False).iloc[0,0]
+        print('Best Model:\n', model_report[model_report.ModelName == best_model_name], '\n\n')
+        return models[best_model_name], model_report
+
+    def save_model(self, best_model) -> str:
+        saveObject(
+            file_path = self.config.trained_model_file_path,
+            obj = strip_cv_attributes(best_model)
+        )
+        return self.config.trained_model_file_path
+
+    def initiate_model_training(self, train_data: np.array, test_data: np.array) -> str:
+        try:
+            best_model, _ = self.select_model(train_data, test_data)
+            return self.save_model(best_model)
 
         except Exception as e:
             logging.error('FAILED Model Training')
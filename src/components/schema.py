@@ -0,0 +1,112 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+# Declared dtypes of the delivery dataset, applied by read_csv while parsing.
+# Repeated strings become categoricals, coordinates/ratings float32. Every numeric
+# column may be missing in new data (the imputers fill the features, a missing
+# target is skipped), so small integers such as Vehicle_condition are float32 too.
+DELIVERY_SCHEMA = {
+    'ID': 'object',
+    'Delivery_person_ID': 'category',
+    'Delivery_person_Age': 'float32',
+    'Delivery_person_Ratings': 'float32',
+    'Restaurant_latitude': 'float32',
+    'Restaurant_longitude': 'float32',
+    'Delivery_location_latitude': 'float32',
+    'Delivery_location_longitude': 'float32',
+    'Order_Date': 'category',
+    'Time_Orderd': 'category',
+    'Time_Order_picked': 'category',
+    'Weather_conditions': 'category',
+    'Road_traffic_density': 'category',
+    'Vehicle_condition': 'float32',
+    'Type_of_order': 'category',
+    'Type_of_vehicle': 'category',
+    'multiple_deliveries': 'float32',
+    'Festival': 'category',
+    'City': 'category',
+    'Time_taken (min)': 'float32',
+}
+
+
+def read_csv(source, *args, schema: dict = DELIVERY_SCHEMA, **kwargs):
+    '''pd.read_csv with the schema dtypes, an explicit dtype argument wins per column.\n
+        An integer column that turns out to hold missing values is read as float32
+        instead of failing the whole load. A chunked read (chunksize / iterator) would
+        only fail while its chunks are iterated, so it reads integers as float32 from
+        the start.'''
+    dtype = {**schema, **(kwargs.pop('dtype', None) or {})}
+    if kwargs.get('chunksize') or kwargs.get('iterator'):
+        return pd.read_csv(source, *args, dtype = float_integers(dtype), **kwargs)
+    try:
+        return pd.read_csv(source, *args, dtype = dtype, **kwargs)
+    except (ValueError, TypeError):
+        if not isinstance(source, (str, os.PathLike)):
+            raise
+        return pd.read_csv(source, *args, dtype = float_integers(dtype), **kwargs)
+
+
+def float_integers(dtype: dict) -> dict:
+    '''dtype with every integer column as float32, which can hold NaN.'''
+    return {col: ('float32' if str(kind).startswith('int') else kind) for col, kind in dtype.items()}
+
+
+def nbytes(obj) -> int:
+    '''Bytes held by DataFrames / arrays, summed through tuples and lists.'''
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(obj.memory_usage(deep = True).sum()) if isinstance(obj, pd.DataFrame) else int(obj.memory_usage(deep = True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (tuple, list)):
+        return sum(nbytes(item) for item in obj)
+    return 0
+
+
+def rss_bytes() -> int:
+    '''Current resident set size of this process, 0 where /proc is unavailable.'''
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def peak_rss_bytes() -> int:
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def process_memory() -> dict:
+    '''Rss, Pss and the shared/private split of this process in MB, from /proc/self/smaps_rollup.\n
+        Pss charges each shared page to the processes mapping it in equal parts, summed over
+        prefork workers it is their real footprint, while Rss counts shared pages in every one.'''
+    fields = {'Rss': 'rss_mb', 'Pss': 'pss_mb', 'Shared_Clean': 'shared_clean_mb', 'Shared_Dirty': 'shared_dirty_mb',
+              'Private_Clean': 'private_clean_mb', 'Private_Dirty': 'private_dirty_mb'}
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            report = {}
+            for line in file:
+                name, _, value = line.partition(':')
+                if name in fields:
+                    report[fields[name]] = round(int(value.split()[0]) / 1024, 1)
+            return report
+    except (OSError, ValueError):
+        return {'rss_mb': round(rss_bytes() / 2 ** 20, 1)}
+
+
+def memory_usage(value = None) -> dict:
+    '''Memory figures for the stage report: the stage output, current and peak RSS, in MB.'''
+    return {
+        'output_mb': round(nbytes(value) / 2 ** 20, 2),
+        'rss_mb': round(rss_bytes() / 2 ** 20, 1),
+        'peak_rss_mb': round(peak_rss_bytes() / 2 ** 20, 1)
+    }
@@ -0,0 +1,152 @@
+import os, sys
+from src.exception import CustomException
+from src.logger import logging
+from src.utlility import saveObject, globe_distance, file_lock
+from src.components.data_transformation import DataTransform
+from src.components.incremental_trainer import IncrementalTrainerConfig
+from src.components.time_feature import minute_of_day, MINUTES_PER_DAY
+from src.components.schema import read_csv
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDRegressor
+from sklearn.preprocessing import StandardScaler
+from dataclasses import dataclass
+
+
+@dataclass
+class StreamingTrainerConfig:
+    preprocessor_obj_path = os.path.join('artifacts', 'preprocessor.joblib')
+    trained_model_file_path = os.path.join('artifacts', 'model.joblib')
+    target_col_name = 'Time_taken (min)'
+    chunk_size: int = 50_000
+    # Rows kept in memory to fit the imputers (approximate medians / most frequent)
+    sample_size: int = 20_000
+    test_size: float = 0.3
+    n_epochs: int = 3
+    random_state: int = 7
+
+
+@dataclass
+class StreamingTrainer:
+    '''Trains the same preprocessor + a linear model without holding the dataset in memory.\n
+        pass 1: bottom-k reservoir sample for the imputers, exact median gap from a histogram\n
+        pass 2: StandardScaler.partial_fit over every chunk (running mean/variance)\n
+        pass 3+: SGDRegressor.partial_fit, one pass per epoch, then a streamed evaluation\n
+        Peak memory is bounded by chunk_size + sample_size rows.'''
+
+    config = StreamingTrainerConfig()
+
+    def read_chunks(self, url: str, *args, **kwargs):
+        '''Yields (chunk, is_test) with a train/test assignment that is stable across passes.'''
+        start = 0
+        for chunk in read_csv(url, *args, chunksize = self.config.chunk_size, **kwargs):
+            rows = np.arange(start, start + len(chunk), dtype = np.uint64)
+            start += len(chunk)
+
+            # Multiplicative hash of the row number, same split on every pass without storing it
+            bucket = (rows * np.uint64(2654435761) + np.uint64(self.config.random_state)) % np.uint64(1 << 32)
+            is_test = bucket < np.uint64(self.config.test_size * (1 << 32))
+
+            # Deliveries without a recorded time cannot be learned from or scored against
+            labeled = chunk[self.config.target_col_name].notna().to_numpy()
+            if not labeled.all():
+                chunk, is_test = chunk[labeled], is_test[labeled]
+
+            chunk['distance_rest_deliv'] = globe_distance(
+                data = chunk,
+                x1 = 'Restaurant_latitude',
+                y1 = 'Restaurant_longitude',
+                x2 = 'Delivery_location_latitude',
+                y2 = 'Delivery_location_longitude'
+                )
+            yield chunk, is_test
+
+    def sample_pass(self, url: str, *args, **kwargs):
+        rng = np.random.default_rng(self.config.random_state)
+        sample = None
+        gap_histogram = np.zeros(MINUTES_PER_DAY, dtype = np.int64)
+
+        for chunk, is_test in self.read_chunks(url, *args, **kwargs):
+            train = chunk[~is_test]
+
+            ordered, picked = minute_of_day(train['Time_Orderd']), minute_of_day(train['Time_Order_picked'])
+            gap = (picked - ordered) % MINUTES_PER_DAY
+            gap_histogram += np.bincount(gap[~np.isnan(gap)].astype(np.int64), minlength = MINUTES_PER_DAY)
+
+            # Bottom-k on random keys keeps a uniform sample of everything seen so far
+            train = train.assign(_key = rng.random(len(train)))
+            sample = train if sample is None else pd.concat([sample, train])
+            sample = sample.nsmallest(self.config.sample_size, '_key')
+
+        cumulative = np.cumsum(gap_histogram)
+        median_gap = float(np.searchsorted(cumulative, cumulative[-1] / 2)) if cumulative[-1] else 0.0
+        return sample.drop(columns = '_key'), median_gap
+
+    def initiate_streaming_training(self, url: str, *args, **kwargs) -> tuple:
+        try:
+            logging.info('Streaming Training Initiated')
+            target = self.config.target_col_name
+
+            sample, median_gap = self.sample_pass(url, *args, **kwargs)
+            logging.info(f'Streaming Sample Pass Done, {len(sample)} rows sampled')
+
+            preprocessor = DataTransform().build_pipeline()
+            preprocessor.fit(sample)
+            preprocessor.named_steps['time'].median_gap_ = median_gap
+            del sample
+
+            # Refit the scalers on the full stream with running statistics
+            time_feature, columns = preprocessor.named_steps['time'], preprocessor.named_steps['columns']
+            parts = [(pipe, cols) for name, pipe, cols in columns.transformers_ if name != 'remainder']
+            for pipe, _ in parts:
+                pipe.steps[-1] = (pipe.steps[-1][0], StandardScaler())
+
+            for chunk, is_test in self.read_chunks(url, *args, **kwargs):
+                features = time_feature.transform(chunk[~is_test])
+                for pipe, cols in parts:
+                    pipe[-1].partial_fit(pipe[:-1].transform(features[cols]))
+            logging.info('Streaming Scaler Pass Done')
+
+            model = SGDRegressor(random_state = self.config.random_state)
+            for epoch in range(self.config.n_epochs):
+                for chunk, is_test in self.read_chunks(url, *args, **kwargs):
+                    train = chunk[~is_test].sample(frac = 1, random_state = self.config.random_state + epoch)
+                    model.partial_fit(preprocessor.transform(train), train[target].to_numpy())
+                logging.info(f'Streaming Epoch {epoch + 1} Done')
+
+            model_report = self.evaluate(model, preprocessor, url, *args, **kwargs)
+            logging.info(f'Model Report: \n{model_report}')
+            print('Model Reports:\n', model_report, '\n\n')
+
+            # Under the append lock, an append running now must not write over the new model
+            with file_lock(IncrementalTrainerConfig.lock_path):
+                saveObject(file_path = self.config.preprocessor_obj_path, obj = preprocessor)
+                saveObject(file_path = self.config.trained_model_file_path, obj = model)
+            return self.config.preprocessor_obj_path, self.config.trained_model_file_path
+
+        except Exception as e:
+            logging.error('FAILED Streaming Training')
+            logging.error(e)
+            raise CustomException(e, sys)
+
+    def evaluate(self, model, preprocessor, url: str, *args, **kwargs) -> pd.DataFrame:
+        '''Same report as evalute_model, accumulated chunk by chunk over the test rows.'''
+        n = abs_err = sq_err = y_sum = y_sq_sum = 0.0
+        for chunk, is_test in self.read_chunks(url, *args, **kwargs):
+            test = chunk[is_test]
+            if not len(test):
+                continue
+            y = test[self.config.target_col_name].to_numpy(dtype = float)
+            err = y - model.predict(preprocessor.transform(test))
+            n += len(y)
+            abs_err += np.abs(err).sum()
+            sq_err += np.square(err).sum()
+            y_sum += y.sum()
+            y_sq_sum += np.square(y).sum()
+
+        total_sq = y_sq_sum - y_sum ** 2 / n
+        return pd.DataFrame(
+            [[type(model).__name__, abs_err / n, 1 - sq_err / total_sq, np.sqrt(sq_err / n)]],
+            columns = ['ModelName', 'MAE', 'R2Score', 'RMSE']
+        )
@@ -0,0 +1,83 @@
+import re
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+MINUTES_PER_DAY = 24 * 60
+COLON, ZERO, NINE = ord(':'), ord('0'), ord('9')
+
+
+def minute_of_day(times: pd.Series) -> np.ndarray:
+    '''Returns float minute-of-day for a Series of time strings, NaN where unparsable.\n
+        23:12 -> 1392\n
+        24:00 -> 0\n
+        10:00:00 -> 600\n
+        0.422 -> NaN\n
+        NaN -> NaN'''
+
+    if isinstance(times.dtype, pd.CategoricalDtype):
+        # Parse each distinct time once, then gather by code (-1, missing, hits the NaN slot)
+        return np.append(minute_of_day(pd.Series(times.cat.categories.astype(str))), np.nan)[times.cat.codes.to_numpy()]
+
+    # Fixed width code points, one row per time, parsed column-wise (H:MM, HH:MM, optional :SS).
+    # A ninth slot catches strings longer than HH:MM:SS; those and non-ASCII ones are no time.
+    raw = times.fillna('').astype(str).str.strip().to_numpy(dtype = 'U9')
+    points = raw.view(np.uint32).reshape(len(raw), 9)
+    valid = (points[:, 8] == 0) & (points < 128).all(axis = 1)
+    b = np.where(valid[:, None], points[:, :8], 0).astype(np.int16)
+    digit = (b >= ZERO) & (b <= NINE)
+    d = b - ZERO
+
+    two = digit[:, 0] & digit[:, 1] & (b[:, 2] == COLON) & digit[:, 3] & digit[:, 4]
+    two &= (b[:, 5] == 0) | ((b[:, 5] == COLON) & digit[:, 6] & digit[:, 7])
+    one = digit[:, 0] & (b[:, 1] == COLON) & digit[:, 2] & digit[:, 3]
+    one &= (b[:, 4] == 0) | ((b[:, 4] == COLON) & digit[:, 5] & digit[:, 6] & (b[:, 7] == 0))
+
+    minutes = np.where(
+        two,
+        (d[:, 0] * 10 + d[:, 1]) * 60 + d[:, 3] * 10 + d[:, 4],
+        d[:, 0] * 60 + d[:, 2] * 10 + d[:, 3]
+    )
+    return np.where(two | one, minutes % MINUTES_PER_DAY, np.nan)
+
+
+# The shapes minute_of_day accepts: H:MM, HH:MM, H:MM:SS, HH:MM:SS in ASCII digits
+TIME_PATTERN = re.compile(r'([0-9]{1,2}):([0-9]{2})(?::[0-9]{2})?')
+
+
+def parse_minute(time) -> float:
+    '''Scalar version of minute_of_day, for single rows outside pandas, same accepted shapes.'''
+    if time is None or time is pd.NA or time != time:
+        return np.nan
+    match = TIME_PATTERN.fullmatch(str(time).strip())
+    if match is None:
+        return np.nan
+    return float((int(match[1]) * 60 + int(match[2])) % MINUTES_PER_DAY)
+
+
+def order_hour(ordered: np.ndarray, picked: np.ndarray, median_gap: float) -> np.ndarray:
+    '''Hour of the order, back-filled from pick-up time minus the median gap.'''
+    ordered = np.where(np.isnan(ordered), (picked - median_gap) % MINUTES_PER_DAY, ordered)
+    return np.floor(ordered / 60)
+
+
+class TimeFeature(BaseEstimator, TransformerMixin):
+    '''Adds order_hour from Time_Orderd / Time_Order_picked.\n
+        The median order-to-pickup gap is learned at fit time, so a single-row
+        transform fills a missing order time with the training median.'''
+
+    def __init__(self, ordered_col: str = 'Time_Orderd', picked_col: str = 'Time_Order_picked'):
+        self.ordered_col = ordered_col
+        self.picked_col = picked_col
+
+    def fit(self, X: pd.DataFrame, y = None):
+        ordered, picked = minute_of_day(X[self.ordered_col]), minute_of_day(X[self.picked_col])
+        gap = (picked - ordered) % MINUTES_PER_DAY
+        gap = gap[~np.isnan(gap)]
+        self.median_gap_ = float(np.median(gap)) if len(gap) else 0.0
+        return self
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        ordered, picked = minute_of_day(X[self.ordered_col]), minute_of_day(X[self.picked_col])
+        return X.assign(order_hour = order_hour(ordered, picked, self.median_gap_))
@@ -1,15 +1,166 @@
 import logging
+import logging.handlers
+import atexit
 import os
-from datetime import datetime
+import queue
+import threading
+from contextlib import contextmanager
 
-LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
+LOG_FORMAT = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s"
 logs_path = os.path.join(os.getcwd(), 'logs')
-os.makedirs(logs_path, exist_ok = True)
 
-LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
+# One file, rotated by size (LOG_MAX_BYTES) or by time when LOG_ROTATE_WHEN is set (e.g. 'midnight')
+LOG_FILE_PATH = os.path.join(logs_path, 'app.log')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+LOG_ROTATE_WHEN = os.environ.get('LOG_ROTATE_WHEN')
 
-logging.basicConfig(
-    filename = LOG_FILE_PATH,
-    format = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level = logging.INFO
-)
\ No newline at end of file
+# Per-request messages go through this logger, off unless LOG_HOT_PATH_LEVEL allows them
+hot_path = logging.getLogger('hot_path')
+hot_path.setLevel(os.environ.get('LOG_HOT_PATH_LEVEL', 'WARNING').upper())
+
+
+class lazy:
+    '''Defers building an expensive message argument until a handler formats it,
+        logging.debug('%s', lazy(lambda: df.head().to_string())) costs nothing below DEBUG.'''
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __str__(self):
+        return str(self.fn())
+
+
+class MakeDirsMixin:
+    '''Creates the log directory on the first write instead of at import.'''
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok = True)
+        return super()._open()
+
+
+class RotatingFileHandler(MakeDirsMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+
+class TimedRotatingFileHandler(MakeDirsMixin, logging.handlers.TimedRotatingFileHandler):
+    pass
+
+
+class FileHandler(MakeDirsMixin, logging.FileHandler):
+    pass
+
+
+class QueueListener(logging.handlers.QueueListener):
+    '''Writer thread that also accepts handlers added and removed while running.'''
+
+    def handle(self, record):
+        marker = getattr(record, 'flush_marker', None)
+        if marker is not None:
+            marker.set()
+            return
+        super().handle(record)
+
+    def add_handler(self, handler) -> None:
+        self.handlers = self.handlers + (handler,)
+
+    def remove_handler(self, handler) -> None:
+        self.handlers = tuple(h for h in self.handlers if h is not handler)
+
+
+def file_handler(file_path: str) -> logging.Handler:
+    if LOG_ROTATE_WHEN:
+        handler = TimedRotatingFileHandler(file_path, when = LOG_ROTATE_WHEN, backupCount = LOG_BACKUP_COUNT, delay = True)
+    else:
+        handler = RotatingFileHandler(file_path, maxBytes = LOG_MAX_BYTES, backupCount = LOG_BACKUP_COUNT, delay = True)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+log_queue = queue.SimpleQueue()
+listener = None
+# Shared file of this process, None when it writes none
+log_file_path = None
+
+
+def configure(file_path: str = LOG_FILE_PATH, level: str = LOG_LEVEL) -> None:
+    '''Routes the root logger through a queue to a background writer thread.\n
+        Callers only enqueue the record; formatting and disk writes happen on the
+        listener thread. file_path None keeps the queue but writes no shared file,
+        e.g. in training workers that only write per-run logs.'''
+    global listener, log_file_path
+    if listener is not None:
+        flush()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+    log_file_path = file_path
+    listener = QueueListener(log_queue, *([file_handler(file_path)] if file_path else []), respect_handler_level = True)
+    listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+
+def flush(timeout: float = 5.0) -> None:
+    '''Blocks until every record queued before the call has been written.'''
+    if listener is None or listener._thread is None:
+        return
+    marker = threading.Event()
+    record = logging.makeLogRecord({'msg': '', 'flush_marker': marker})
+    log_queue.put(record)
+    marker.wait(timeout)
+
+
+@contextmanager
+def run_log(file_path: str):
+    '''Also writes every record logged inside the block to file_path, one file per training run.'''
+    handler = FileHandler(file_path, delay = True)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener.add_handler(handler)
+    try:
+        yield file_path
+    finally:
+        flush()
+        listener.remove_handler(handler)
+        handler.close()
+
+
+def worker_log_path(file_path: str, pid: int) -> str:
+    '''logs/app.log -> logs/app.<pid>.log'''
+    root, ext = os.path.splitext(file_path)
+    return f'{root}.{pid}{ext}'
+
+
+def restart_after_fork() -> None:
+    '''fork does not copy the writer thread, a forked worker (e.g. gunicorn with preload_app)
+        starts its own on a fresh queue, writing to its own logs/app.<pid>.log: the parent
+        keeps rotating the shared file, and several processes rotating it would clobber it.'''
+    global listener, log_queue
+    if listener is None or listener._thread is None:
+        return
+    log_queue = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            handler.queue = log_queue
+    # The parent's handlers, shared file and per-run logs alike, stay with the parent
+    handlers = [file_handler(worker_log_path(log_file_path, os.getpid()))] if log_file_path else []
+    listener = QueueListener(log_queue, *handlers, respect_handler_level = True)
+    listener.start()
+
+
+def shutdown() -> None:
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+
+configure()
+atexit.register(shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child = restart_after_fork)
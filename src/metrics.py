@@ -0,0 +1,179 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter as Tally
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+
+
+# Seconds, from sub-millisecond feature steps up to a slow Redis round trip
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+@dataclass
+class Counter:
+    name: str
+    help: str
+    labelnames: tuple = ()
+    values: dict = field(default_factory = dict)
+    lock: threading.Lock = field(default_factory = threading.Lock, repr = False)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self.lock:
+            values = dict(self.values)
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        lines += [f'{self.name}{format_labels(self.labelnames, key)} {value}' for key, value in sorted(values.items())]
+        return lines
+
+
+@dataclass
+class Histogram:
+    '''Cumulative bucket counts, sum and count per label set, Prometheus style.'''
+
+    name: str
+    help: str
+    labelnames: tuple = ()
+    buckets: tuple = DEFAULT_BUCKETS
+    values: dict = field(default_factory = dict)
+    lock: threading.Lock = field(default_factory = threading.Lock, repr = False)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                # One slot per bucket, then sum and count
+                counts = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self) -> list:
+        with self.lock:
+            values = {key: list(counts) for key, counts in self.values.items()}
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{labels} {counts[-1]}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, key)} {counts[-2]}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, key)} {counts[-1]}')
+        return lines
+
+
+@dataclass
+class MetricsRegistry:
+    '''In-process metrics, exposed in the Prometheus text format by render().\n
+        Every process (e.g. each gunicorn worker) keeps its own numbers, the
+        scraper sums them across instances.'''
+
+    metrics: dict = field(default_factory = dict)
+    lock: threading.Lock = field(default_factory = threading.Lock, repr = False)
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, help, tuple(labelnames)))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, tuple(labelnames), tuple(buckets)))
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+registry = MetricsRegistry()
+
+span_seconds = registry.histogram('span_seconds', 'Duration of instrumented code spans', ('span',))
+span_errors = registry.counter('span_errors_total', 'Instrumented code spans that raised', ('span',))
+request_seconds = registry.histogram('http_request_seconds', 'HTTP request duration', ('endpoint', 'method'))
+request_total = registry.counter('http_requests_total', 'HTTP requests by status', ('endpoint', 'method', 'status'))
+
+
+@contextmanager
+def span(name: str):
+    '''Times the block into span_seconds{span=name}; spans may nest, each is timed on its own.'''
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        span_errors.inc(span = name)
+        raise
+    finally:
+        span_seconds.observe(time.perf_counter() - start, span = name)
+
+
+def timed(name: str):
+    '''Decorator form of span.'''
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@dataclass
+class SamplingProfiler:
+    '''Samples the stack of one thread every interval seconds from a helper thread.\n
+        Meant for a single request: the cost is one sys._current_frames() call per
+        sample and nothing at all while stopped. folded() returns the stacks in the
+        "frame;frame;frame count" format read by flamegraph.pl and speedscope.'''
+
+    thread_id: int = field(default_factory = threading.get_ident)
+    interval: float = float(os.environ.get('PROFILE_INTERVAL', 0.001))
+    samples: Tally = field(default_factory = Tally)
+    stop_event: threading.Event = field(default_factory = threading.Event, repr = False)
+    sampler: threading.Thread = None
+
+    def start(self) -> 'SamplingProfiler':
+        self.sampler = threading.Thread(target = self.run, daemon = True)
+        self.sampler.start()
+        return self
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                stack.append(f'{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})')
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> 'SamplingProfiler':
+        self.stop_event.set()
+        if self.sampler is not None:
+            self.sampler.join()
+        return self
+
+    def folded(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
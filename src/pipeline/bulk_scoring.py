@@ -0,0 +1,224 @@
+import os, sys
+import json
+import multiprocessing
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from src.exception import CustomException
+from src.logger import logging, configure
+from src.artifact_cache import file_sha256
+from src.stage_cache import source_fingerprint
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+
+@dataclass
+class BulkScoringConfig:
+    preprocessor_path = os.path.join('artifacts', 'preprocessor.joblib')
+    model_path = os.path.join('artifacts', 'model.joblib')
+    chunk_size: int = 100_000
+    workers: int = os.cpu_count() or 1
+    # Columns copied from the input next to each prediction, when present
+    keep_columns: tuple = ('ID',)
+    prediction_column = 'prediction'
+
+
+def init_worker() -> None:
+    '''Loads the artifacts once per worker process, every chunk it scores reuses them.'''
+    # Only the parent writes logs/app.log, several processes rotating it would clobber it
+    configure(file_path = None)
+    from src.pipeline.prediction_pipeline import PredictPipeline
+    PredictPipeline().warm()
+
+
+def score_chunk(chunk: pd.DataFrame, keep_columns: list, prediction_column: str) -> pd.DataFrame:
+    '''Runs in a worker: distance feature, preprocessor and model over one chunk.'''
+    from src.pipeline.prediction_pipeline import PredictPipeline, build_features
+
+    kept = chunk[keep_columns].reset_index(drop = True)
+    features = build_features(chunk.rename(columns = {'Order_Date': 'Date_Order'}))
+    kept[prediction_column] = PredictPipeline().predict(features)
+    return kept
+
+
+@dataclass
+class ChunkWriter:
+    '''Writes scored chunks in input order, a CSV file or a directory of Parquet parts.\n
+        Both can be cut back to the first n chunks, which is what resuming needs:
+        the CSV by truncating it to the size it had after chunk n, the Parquet
+        directory by removing the parts from n on.'''
+
+    output_path: str
+    csv: bool = field(init = False)
+
+    def __post_init__(self):
+        self.csv = self.output_path.lower().endswith('.csv')
+
+    def truncate(self, chunks: int, size: int) -> None:
+        if self.csv:
+            if os.path.exists(self.output_path):
+                with open(self.output_path, 'r+b') as file:
+                    file.truncate(size)
+            return
+        os.makedirs(self.output_path, exist_ok = True)
+        for name in os.listdir(self.output_path):
+            if name.startswith('part-') and int(name[5:].split('.')[0]) >= chunks:
+                os.remove(os.path.join(self.output_path, name))
+
+    def write(self, index: int, scored: pd.DataFrame) -> int:
+        '''Appends chunk index, returns the size of the CSV output after it (0 for Parquet).'''
+        if self.csv:
+            with open(self.output_path, 'a', newline = '') as file:
+                scored.to_csv(file, header = index == 0, index = False)
+                file.flush()
+                os.fsync(file.fileno())
+            return os.path.getsize(self.output_path)
+        scored.to_parquet(os.path.join(self.output_path, f'part-{index:06d}.parquet'), index = False)
+        return 0
+
+
+@dataclass
+class BulkScorer:
+    '''Scores a CSV or Parquet file of orders offline, chunk by chunk over a process pool.\n
+        At most two chunks per worker are in flight, so memory stays bounded by the
+        chunk size whatever the input size. Results are written in input order and
+        a checkpoint next to the output records the chunks done; a rerun with the
+        same input, chunk size and model continues after the last written chunk.'''
+
+    config: BulkScoringConfig = field(default_factory = BulkScoringConfig)
+
+    def read_chunks(self, input_path: str, skip_rows: int = 0):
+        if input_path.lower().endswith('.csv'):
+            from src.components.schema import read_csv
+            # Rows before skip_rows are tokenized but never become DataFrames
+            yield from read_csv(input_path, chunksize = self.config.chunk_size, skiprows = range(1, skip_rows + 1))
+            return
+
+        import pyarrow.parquet as pq
+        skipped = 0
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size = self.config.chunk_size):
+            if skipped < skip_rows:
+                skipped += batch.num_rows
+                continue
+            yield batch.to_pandas()
+
+    def checkpoint_path(self, output_path: str) -> str:
+        return f'{output_path.rstrip(os.sep)}.checkpoint.json'
+
+    def job_identity(self, input_path: str) -> dict:
+        '''What must not change for a resumed run to be the continuation of the interrupted one.'''
+        return {
+            'input': source_fingerprint(input_path),
+            'chunk_size': self.config.chunk_size,
+            'model': file_sha256(self.config.preprocessor_path) + file_sha256(self.config.model_path)
+        }
+
+    def load_checkpoint(self, output_path: str, identity: dict) -> dict:
+        try:
+            with open(self.checkpoint_path(output_path)) as file:
+                checkpoint = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get('identity') != identity:
+            raise ValueError('Checkpoint belongs to another input, chunk size or model, use --restart')
+        return checkpoint
+
+    def save_checkpoint(self, output_path: str, checkpoint: dict) -> None:
+        tmp_path = f'{self.checkpoint_path(output_path)}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(checkpoint, file)
+        os.replace(tmp_path, self.checkpoint_path(output_path))
+
+    def score(self, input_path: str, output_path: str, restart: bool = False) -> dict:
+        '''Scores input_path into output_path and returns the rows, time and rows/s of this run.'''
+        identity = self.job_identity(input_path)
+        writer = ChunkWriter(output_path)
+
+        checkpoint = None if restart else self.load_checkpoint(output_path, identity)
+        if checkpoint is None:
+            if os.path.isdir(output_path):
+                shutil.rmtree(output_path)
+            elif os.path.exists(output_path):
+                os.remove(output_path)
+            checkpoint = {'identity': identity, 'chunks': 0, 'rows': 0, 'output_size': 0, 'finished': False}
+        elif checkpoint['finished']:
+            logging.info(f'Bulk Scoring of {input_path} already finished, {checkpoint["rows"]} rows')
+            return {'rows': 0, 'total_rows': checkpoint['rows'], 'seconds': 0.0, 'rows_per_s': None, 'resumed_at': checkpoint['rows']}
+        else:
+            logging.info(f'Bulk Scoring Resuming after chunk {checkpoint["chunks"]}, {checkpoint["rows"]} rows')
+        writer.truncate(checkpoint['chunks'], checkpoint['output_size'])
+        resumed_at = checkpoint['rows']
+
+        start = time.perf_counter()
+        rows = 0
+        max_in_flight = 2 * self.config.workers
+        with ProcessPoolExecutor(
+            max_workers = self.config.workers,
+            mp_context = multiprocessing.get_context('spawn'),
+            initializer = init_worker
+        ) as pool:
+            pending = {}
+            next_index = checkpoint['chunks']
+
+            def write_ready(block: bool) -> None:
+                nonlocal next_index, rows
+                while next_index in pending and (block or pending[next_index].done()):
+                    scored = pending.pop(next_index).result()
+                    checkpoint['output_size'] = writer.write(next_index, scored)
+                    checkpoint['chunks'] = next_index = next_index + 1
+                    checkpoint['rows'] += len(scored)
+                    rows += len(scored)
+                    self.save_checkpoint(output_path, checkpoint)
+
+                    seconds = time.perf_counter() - start
+                    logging.info(f'Bulk Scoring chunk {next_index}: {checkpoint["rows"]} rows, {rows / seconds:,.0f} rows/s')
+
+            for index, chunk in enumerate(self.read_chunks(input_path, resumed_at), start = checkpoint['chunks']):
+                keep_columns = [col for col in self.config.keep_columns if col in chunk]
+                pending[index] = pool.submit(score_chunk, chunk, keep_columns, self.config.prediction_column)
+                write_ready(block = len(pending) >= max_in_flight)
+            write_ready(block = True)
+
+        checkpoint['finished'] = True
+        self.save_checkpoint(output_path, checkpoint)
+
+        seconds = time.perf_counter() - start
+        report = {
+            'rows': rows,
+            'total_rows': checkpoint['rows'],
+            'seconds': round(seconds, 3),
+            'rows_per_s': round(rows / seconds, 1) if seconds else None,
+            'resumed_at': resumed_at
+        }
+        logging.info(f'Bulk Scoring Finished: {report}')
+        return report
+
+    def initiate_bulk_scoring(self, input_path: str, output_path: str, restart: bool = False) -> dict:
+        try:
+            return self.score(input_path, output_path, restart)
+
+        except Exception as e:
+            logging.error('Bulk Scoring Failed')
+            logging.error(e)
+            raise CustomException(e, sys)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Scores a CSV or Parquet file of orders with the published model.')
+    parser.add_argument('input', help = 'orders with the training dataset columns, .csv or .parquet')
+    parser.add_argument('output', help = '.csv for one CSV file, anything else for a directory of Parquet parts')
+    parser.add_argument('--chunk-size', type = int, default = BulkScoringConfig.chunk_size)
+    parser.add_argument('--workers', type = int, default = BulkScoringConfig.workers)
+    parser.add_argument('--keep', nargs = '*', default = list(BulkScoringConfig.keep_columns), help = 'input columns copied to the output')
+    parser.add_argument('--restart', action = 'store_true', help = 'ignore an existing checkpoint and start over')
+    args = parser.parse_args()
+
+    config = BulkScoringConfig(chunk_size = args.chunk_size, workers = args.workers, keep_columns = tuple(args.keep))
+    try:
+        report = BulkScorer(config).score(args.input, args.output, args.restart)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(report))
@@ -0,0 +1,98 @@
+import os, sys
+from src.exception import CustomException
+from src.logger import logging
+from src.components.time_feature import parse_minute, order_hour, MINUTES_PER_DAY
+
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Mapping
+
+
+@dataclass
+class KernelPredictor:
+    '''Pure NumPy predictor over the bundle written by ModelExport.\n
+        Takes the preprocessor input columns (raw order times and
+        distance_rest_deliv) as a mapping of arrays, or a single row as a dict.'''
+
+    kernel_path: str = os.path.join('artifacts', 'model_kernel.npz')
+    bundle: dict = field(default = None, repr = False)
+
+    def __post_init__(self):
+        try:
+            if self.bundle is None:
+                with np.load(self.kernel_path, allow_pickle = False) as npz:
+                    self.bundle = {key: npz[key] for key in npz.files}
+
+            b = self.bundle
+            self.num_columns = b['num_columns'].tolist()
+            self.cat_columns = b['cat_columns'].tolist()
+            self.num_fill = b['num_fill']
+            self.num_weight = b['num_weight']
+            self.bias = float(b['bias'][0])
+            self.ordered_col, self.picked_col = b['time_columns'].tolist()
+            self.median_gap = float(b['median_gap'][0])
+
+            offsets = b['cat_offsets'].tolist()
+            values, table = b['cat_values'].tolist(), b['cat_table'].tolist()
+            self.lookups = [dict(zip(values[i:j], table[i:j])) for i, j in zip(offsets[:-1], offsets[1:])]
+            self.cat_missing = b['cat_missing'].tolist()
+            # Kernels exported before the category code encoder reject unknown categories
+            self.cat_unknown = b['cat_unknown'].tolist() if 'cat_unknown' in b else [None] * len(self.cat_columns)
+
+            # Python-float copies for the single row path
+            self._row_num = list(zip(self.num_columns, self.num_fill.tolist(), self.num_weight.tolist()))
+            self._row_cat = list(zip(self.cat_columns, self.lookups, self.cat_missing, self.cat_unknown))
+
+        except Exception as e:
+            logging.error(f'FAIL Load Model Kernel at {self.kernel_path}')
+            logging.error(e)
+            raise CustomException(e, sys)
+
+    def order_hour(self, ordered, picked) -> np.ndarray:
+        ordered = np.fromiter((parse_minute(value) for value in ordered), dtype = np.float64)
+        picked = np.fromiter((parse_minute(value) for value in picked), dtype = np.float64)
+        return order_hour(ordered, picked, self.median_gap)
+
+    def predict(self, columns: Mapping) -> np.ndarray:
+        if 'order_hour' not in columns:
+            columns = {**columns, 'order_hour': self.order_hour(columns[self.ordered_col], columns[self.picked_col])}
+
+        num = np.column_stack([np.asarray(columns[col], dtype = np.float32) for col in self.num_columns])
+        num = np.where(np.isnan(num), self.num_fill, num)
+        prediction = num @ self.num_weight + np.float32(self.bias)
+
+        for col, lookup, missing, unknown in self._row_cat:
+            prediction += np.fromiter(
+                (missing if is_missing(value) else category_value(lookup, col, value, unknown) for value in columns[col]),
+                dtype = np.float32, count = len(prediction)
+            )
+        return prediction
+
+    def predict_row(self, row: Mapping) -> float:
+        if 'order_hour' not in row:
+            ordered = parse_minute(row[self.ordered_col])
+            if ordered != ordered:
+                ordered = (parse_minute(row[self.picked_col]) - self.median_gap) % MINUTES_PER_DAY
+            row = {**row, 'order_hour': ordered // 60}
+
+        prediction = self.bias
+        for col, fill, weight in self._row_num:
+            value = row[col]
+            prediction += weight * (fill if is_missing(value) else float(value))
+        for col, lookup, missing, unknown in self._row_cat:
+            value = row[col]
+            prediction += missing if is_missing(value) else category_value(lookup, col, value, unknown)
+        return prediction
+
+
+def is_missing(value) -> bool:
+    return value is None or value != value
+
+
+def category_value(lookup: dict, col: str, value, unknown: float = None) -> float:
+    try:
+        return lookup[value]
+    except KeyError:
+        if unknown is None:
+            raise ValueError(f'Found unknown category {value!r} in column {col}') from None
+        return unknown
@@ -0,0 +1,115 @@
+import os, sys
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from src.exception import CustomException
+from src.logger import logging, hot_path
+from src.pipeline.prediction_pipeline import PredictPipeline, CustomData, build_features
+from src.metrics import registry, span
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+
+batch_size = registry.histogram('predict_batch_size', 'Rows per micro-batch of /predict requests', buckets = (1, 2, 4, 8, 16, 32, 64, 128, 256))
+batch_wait = registry.histogram('predict_batch_wait_seconds', 'Time a /predict request waited for its micro-batch to close')
+
+
+@dataclass
+class MicroBatcherConfig:
+    enabled: bool = os.environ.get('MICRO_BATCHING', '1') == '1'
+    max_batch_size: int = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 64))
+    # A batch closes this long after its first request arrived, or when full
+    max_wait: float = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 2)) / 1000
+    # Upper bound on how long a request thread waits for its result
+    timeout: float = float(os.environ.get('MICRO_BATCH_TIMEOUT', 10))
+
+
+@dataclass
+class MicroBatcher:
+    '''Collects the rows of concurrent /predict requests into one DataFrame.\n
+        Request threads put a CustomData row on a queue and block on a Future; a
+        single batching thread takes the first waiting row, gathers more until the
+        batch is full or max_wait has passed since that first row, then runs one
+        build_features + PredictPipeline.predict call for all of them. A lone
+        request pays at most max_wait extra. If the batch call fails every row is
+        retried on its own, so one bad row does not fail its neighbours.'''
+
+    config: MicroBatcherConfig = field(default_factory = MicroBatcherConfig)
+    pipeline: PredictPipeline = field(default_factory = PredictPipeline)
+    requests: queue.SimpleQueue = field(default_factory = queue.SimpleQueue, repr = False)
+    worker: threading.Thread = None
+    worker_pid: int = None
+    lock: threading.Lock = field(default_factory = threading.Lock, repr = False)
+
+    def start(self) -> None:
+        # Started on first use, and again in a forked worker where the parent's thread does not exist
+        with self.lock:
+            if self.worker is None or self.worker_pid != os.getpid() or not self.worker.is_alive():
+                self.requests = queue.SimpleQueue()
+                self.worker = threading.Thread(target = self.run, name = 'micro-batcher', daemon = True)
+                self.worker_pid = os.getpid()
+                self.worker.start()
+
+    def submit(self, data: CustomData) -> Future:
+        if self.worker is None or self.worker_pid != os.getpid():
+            self.start()
+        future = Future()
+        self.requests.put((data.get_record(), future, time.perf_counter()))
+        return future
+
+    def predict(self, data: CustomData) -> float:
+        '''Prediction for one row, computed together with whatever rows arrive alongside it.'''
+        if not self.config.enabled:
+            return self.pipeline.predict(data.get_data_as_dataframe())[0]
+        return self.submit(data).result(timeout = self.config.timeout)
+
+    def collect(self) -> list:
+        batch = [self.requests.get()]
+        deadline = batch[0][2] + self.config.max_wait
+        while len(batch) < self.config.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.requests.get(timeout = remaining) if remaining > 0 else self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def predict_batch(self, records: list) -> list:
+        data = pd.DataFrame(records, columns = CustomData.col_names)
+        with span('batch_predict'):
+            return list(self.pipeline.predict(build_features(data)))
+
+    def run(self) -> None:
+        while True:
+            batch = self.collect()
+            now = time.perf_counter()
+            batch_size.observe(len(batch))
+            for _, _, queued_at in batch:
+                batch_wait.observe(now - queued_at)
+
+            try:
+                results = self.predict_batch([record for record, _, _ in batch])
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+                hot_path.info('Micro-batch of %d rows predicted', len(batch))
+
+            except Exception as e:
+                if len(batch) == 1:
+                    logging.error('FAILED Micro-batch Prediction')
+                    logging.error(e)
+                    batch[0][1].set_exception(CustomException(e, sys))
+                    continue
+
+                logging.warning(f'Micro-batch of {len(batch)} rows failed, retrying row by row')
+                for record, future, _ in batch:
+                    try:
+                        future.set_result(self.predict_batch([record])[0])
+                    except Exception as row_error:
+                        logging.error('FAILED Micro-batch Prediction')
+                        logging.error(row_error)
+                        future.set_exception(CustomException(row_error, sys))
+
+
+micro_batcher = MicroBatcher()
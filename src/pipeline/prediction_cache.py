@@ -0,0 +1,203 @@
+import os, sys
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from src.exception import CustomException
+from src.logger import logging, hot_path
+from src.utlility import RedisConfig, redis_connect
+from src.artifact_cache import artifact_cache
+from src.pipeline.prediction_pipeline import PredictPipelineConfig, CustomData
+from src.metrics import registry, span
+from dataclasses import dataclass, field, asdict, fields
+from typing import Any
+
+
+prediction_cache_total = registry.counter('prediction_cache_total', 'Prediction cache lookups by tier and result', ('tier', 'result'))
+
+
+@dataclass
+class PredictionCacheConfig:
+    enabled: bool = os.environ.get('PREDICTION_CACHE', '1') == '1'
+    max_entries: int = int(os.environ.get('PREDICTION_CACHE_SIZE', 10_000))
+    ttl: float = float(os.environ.get('PREDICTION_CACHE_TTL', 300))
+    # Shared tier, every worker and instance sees the others' predictions
+    redis_enabled: bool = os.environ.get('PREDICTION_CACHE_REDIS', '0') == '1'
+    redis_ttl: int = int(os.environ.get('PREDICTION_CACHE_REDIS_TTL', 3600))
+    key_prefix = 'prediction:'
+    # A slow Redis must not cost more than recomputing, after a failure it is skipped for retry_after
+    socket_timeout: float = 0.05
+    retry_after: float = 30.0
+
+
+def normalize(value) -> Any:
+    '''Canonical form of one field: numbers as float, strings trimmed, NaN and empty strings as None.'''
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return None if math.isnan(value) else float(value)
+    return None if value is None else str(value)
+
+
+def feature_key(data: CustomData) -> str:
+    '''sha256 of the normalized fields in declaration order, equal orders hash equal however they were typed.'''
+    values = [normalize(getattr(data, f.name)) for f in fields(CustomData)]
+    return hashlib.sha256(json.dumps(values, separators = (',', ':')).encode()).hexdigest()
+
+
+@dataclass
+class PredictionCache:
+    '''Predictions by (normalized order fields, model version), in two tiers.\n
+        A bounded in-process LRU with a TTL answers repeated ETA queries without
+        touching pandas or the model; an optional Redis tier shares results across
+        workers and instances. The model version is the content hash of the loaded
+        artifacts, so a new model starts with an empty local tier and new Redis keys,
+        the old ones simply expire.'''
+
+    config: PredictionCacheConfig = field(default_factory = PredictionCacheConfig)
+    redis_config: RedisConfig = field(default_factory = RedisConfig)
+    artifacts: PredictPipelineConfig = field(default_factory = PredictPipelineConfig)
+    entries: OrderedDict = field(default_factory = OrderedDict)
+    version: str = None
+    connection: Any = None
+    redis_down_until: float = 0.0
+    stats: dict = field(default_factory = lambda: {'local_hits': 0, 'redis_hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0, 'redis_errors': 0})
+    lock: threading.Lock = field(default_factory = threading.Lock, repr = False)
+
+    def model_version(self) -> str:
+        # get() only stats the files while they are unchanged, a replaced artifact is reloaded here
+        artifact_cache.get(self.artifacts.preprocessor_path)
+        artifact_cache.get(self.artifacts.model_path)
+        version = artifact_cache.version(self.artifacts.preprocessor_path, self.artifacts.model_path)
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    if self.version is not None:
+                        self.stats['invalidations'] += 1
+                        logging.info(f'Prediction Cache Invalidated, model version {version[:12]}')
+                    self.entries.clear()
+                    self.version = version
+        return version
+
+    def connect(self):
+        # Created once, redis_connect does not pool clients built with a Retry
+        if self.connection is None:
+            from redis.retry import Retry
+            from redis.backoff import NoBackoff
+
+            self.connection = redis_connect(
+                **asdict(self.redis_config),
+                decode_responses = True,
+                socket_timeout = self.config.socket_timeout,
+                socket_connect_timeout = self.config.socket_timeout,
+                retry = Retry(NoBackoff(), 0)
+            )
+        return self.connection
+
+    def redis_available(self) -> bool:
+        return self.config.redis_enabled and time.monotonic() >= self.redis_down_until
+
+    def redis_failed(self, e: Exception) -> None:
+        logging.warning(f'Prediction Cache Redis Unavailable, skipping it for {self.config.retry_after:.0f} s')
+        logging.warning(e)
+        with self.lock:
+            self.stats['redis_errors'] += 1
+        self.redis_down_until = time.monotonic() + self.config.retry_after
+
+    def get_local(self, key: str) -> float:
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if now >= expires:
+                del self.entries[key]
+                self.stats['expired'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['local_hits'] += 1
+            return value
+
+    def put_local(self, key: str, value: float) -> None:
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.config.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.config.max_entries:
+                self.entries.popitem(last = False)
+                self.stats['evictions'] += 1
+
+    def get_redis(self, key: str) -> float:
+        if not self.redis_available():
+            return None
+        try:
+            with span('redis.get'):
+                value = self.connect().get(self.config.key_prefix + key)
+        except Exception as e:
+            self.redis_failed(e)
+            return None
+        if value is None:
+            return None
+        with self.lock:
+            self.stats['redis_hits'] += 1
+        return float(value)
+
+    def put_redis(self, key: str, value: float) -> None:
+        if not self.redis_available():
+            return
+        try:
+            with span('redis.set'):
+                self.connect().set(self.config.key_prefix + key, repr(float(value)), ex = self.config.redis_ttl)
+        except Exception as e:
+            self.redis_failed(e)
+
+    def get_or_predict(self, data: CustomData, predict) -> float:
+        '''Cached prediction for data, predict(data) computes it on a miss in both tiers.'''
+        if not self.config.enabled:
+            return predict(data)
+        try:
+            key = f'{self.model_version()}:{feature_key(data)}'
+
+            value = self.get_local(key)
+            if value is not None:
+                prediction_cache_total.inc(tier = 'local', result = 'hit')
+                hot_path.info('Prediction Cache Local Hit')
+                return value
+
+            value = self.get_redis(key)
+            if value is not None:
+                prediction_cache_total.inc(tier = 'redis', result = 'hit')
+                self.put_local(key, value)
+                return value
+
+            prediction_cache_total.inc(tier = 'all', result = 'miss')
+            with self.lock:
+                self.stats['misses'] += 1
+            value = float(predict(data))
+            self.put_local(key, value)
+            self.put_redis(key, value)
+            return value
+
+        except Exception as e:
+            logging.error('FAILED Prediction Cache Lookup')
+            logging.error(e)
+            raise CustomException(e, sys)
+
+    def report(self) -> dict:
+        with self.lock:
+            report = dict(self.stats)
+            report['entries'] = len(self.entries)
+            report['model_version'] = self.version
+        lookups = report['local_hits'] + report['redis_hits'] + report['misses']
+        report['hit_rate'] = round((report['local_hits'] + report['redis_hits']) / lookups, 4) if lookups else None
+        report['redis_enabled'] = self.config.redis_enabled
+        return report
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+prediction_cache = PredictionCache()
@@ -1,33 +1,83 @@
 import os
 import sys
-from src.logger import logging
+from src.logger import logging, hot_path
 from src.exception import CustomException
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 
-from src.utlility import loadObject, add_time_feature, globe_distance
+from src.utlility import globe_distance
+from src.artifact_cache import artifact_cache
+from src.metrics import span
+import numpy as np
 import pandas as pd
  
 
+@dataclass
+class PredictPipelineConfig:
+    preprocessor_path = os.path.join('artifacts', 'preprocessor.joblib')
+    model_path = os.path.join('artifacts', 'model.joblib')
+
+
 @dataclass
 class PredictPipeline:
+    config = PredictPipelineConfig()
+
+    def warm(self):
+        '''Load the artifacts into the process-wide cache ahead of the first request.'''
+        artifact_cache.warm(self.config.preprocessor_path, self.config.model_path)
+
+    def warm_in_background(self):
+        '''Same as warm() without blocking, unpickling also imports sklearn, the slowest part of a cold start.'''
+        return artifact_cache.warm_in_background(self.config.preprocessor_path, self.config.model_path)
 
     def predict(self, features):
         try:
-            preprocessor_path = os.path.join('artifacts', 'preprocessor.joblib')
-            model_path = os.path.join('artifacts', 'model.joblib')
-
-            preprocessor = loadObject(preprocessor_path)
-            model = loadObject(model_path)
+            with span('artifact_load'):
+                preprocessor = artifact_cache.get(self.config.preprocessor_path)
+                model = artifact_cache.get(self.config.model_path)
 
-            scaled_data = preprocessor.transform(features)
+            with span('preprocessor_transform'):
+                scaled_data = preprocessor.transform(features)
 
-            prediction = model.predict(scaled_data)
-            logging.info('Successful Predition')
+            with span('model_predict'):
+                prediction = model.predict(scaled_data)
+            hot_path.info('Successful Predition')
             return prediction
         
         except Exception as e:
             logging.error('FAILED Prediction')
             raise CustomException(e, sys)
+
+    def known_categories(self) -> dict:
+        '''Returns {column: pd.Index of categories} for the columns whose unseen values the fitted
+            encoder cannot encode. CategoryCodeEncoder gives them UNKNOWN_CODE, so batch rows are
+            scored like /predict and nothing is returned; an OrdinalEncoder of an older
+            preprocessor raises on them, so its columns are validated.'''
+        from src.components.category_encoder import CategoryCodeEncoder
+
+        preprocessor = artifact_cache.get(self.config.preprocessor_path)
+        for name, pipe, columns in preprocessor.named_steps['columns'].transformers_:
+            if name == 'Cat':
+                encoder = pipe.named_steps.get('encoder') or pipe.named_steps['ordinalencoder']
+                if isinstance(encoder, CategoryCodeEncoder):
+                    return {}
+                return dict(zip(columns, (pd.Index(cats) for cats in encoder.categories_)))
+        return {}
+
+
+def build_features(data: pd.DataFrame) -> pd.DataFrame:
+    '''Adds distance_rest_deliv to data in place, order_hour is added by the preprocessor.'''
+
+    with span('feature_engineering'):
+        # adding distance column
+        data['distance_rest_deliv'] = globe_distance(
+            data = data, 
+            x1 = 'Restaurant_latitude', 
+            y1 = 'Restaurant_longitude', 
+            x2 = 'Delivery_location_latitude', 
+            y2 = 'Delivery_location_longitude'
+            )
+    return data
+
         
 @dataclass
 class CustomData:
@@ -50,41 +100,114 @@ class CustomData:
     Festival: str
     City: str
 
+    col_names = ['Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings', 
+                 'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 
+                 'Delivery_location_longitude', 'Date_Order', 'Time_Orderd', 'Time_Order_picked', 'Weather_conditions', 'Road_traffic_density',
+                 'Vehicle_condition', 'Type_of_order', 'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City']
+
+    def get_record(self) -> list:
+        '''Field values in col_names order, one DataFrame row.'''
+        return [self.Delivery_person_ID, self.Delivery_person_Age, self.Delivery_person_Ratings, self.Restaurant_latitude, 
+                self.Restaurant_longitude, self.Delivery_location_latitude, self.Delivery_location_longitude, self.Order_Date, 
+                self.Time_Orderd, self.Time_Order_picked, self.Weather_conditions, self.Road_traffic_density, self.Vehicle_condition,
+                self.Type_of_order, self.Type_of_vehicle, self.multiple_deliveries, self.Festival, self.City]
+
     def get_data_as_dataframe(self):
         try:
-            
-            col_names = ['Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings', 
-                         'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 
-                         'Delivery_location_longitude', 'Date_Order', 'Time_Orderd', 'Time_Order_picked', 'Weather_conditions', 'Road_traffic_density',
-                         'Vehicle_condition', 'Type_of_order', 'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City']
-            
-            custom_data_input = [[self.Delivery_person_ID, self.Delivery_person_Age, self.Delivery_person_Ratings, self.Restaurant_latitude, 
-                                  self.Restaurant_longitude, self.Delivery_location_latitude, self.Delivery_location_longitude, self.Order_Date, 
-                                  self.Time_Orderd, self.Time_Order_picked, self.Weather_conditions, self.Road_traffic_density, self.Vehicle_condition,
-                                  self.Type_of_order, self.Type_of_vehicle, self.multiple_deliveries, self.Festival, self.City]]
-
-
-            data = pd.DataFrame(custom_data_input, columns = col_names)
-
-            # adding columns
-            add_time_feature(data)
-
-            # adding distance column
-            data['distance_rest_deliv'] = globe_distance(
-                data = data, 
-                x1 = 'Restaurant_latitude', 
-                y1 = 'Restaurant_longitude', 
-                x2 = 'Delivery_location_latitude', 
-                y2 = 'Delivery_location_longitude'
-                )
-
-            logging.info('DataFrame Gathered')
+            custom_data_input = [self.get_record()]
+
+
+            with span('dataframe_build'):
+                data = pd.DataFrame(custom_data_input, columns = self.col_names)
+
+            build_features(data)
+
+            hot_path.info('DataFrame Gathered')
             return data
         except Exception as e:
             logging.error('FAILED DataFrame Gathered')
             logging.error(e)
             raise CustomException(e, sys)
     
+
+@dataclass
+class CustomBatchData:
+    '''Many orders with the CustomData schema, scored as one DataFrame.
+
+        Rows that fail validation are kept out of the feature/predict step and
+        reported back by their position in the input.'''
+
+    data: pd.DataFrame
+
+    numerical_fields = ('Delivery_person_Age', 'Delivery_person_Ratings', 'Restaurant_latitude', 'Restaurant_longitude',
+                        'Delivery_location_latitude', 'Delivery_location_longitude', 'Vehicle_condition', 'multiple_deliveries')
+    # Fields the preprocessor imputes, everything else must be present
+    nullable_fields = ('Delivery_person_Age', 'Delivery_person_Ratings', 'multiple_deliveries', 'Time_Orderd',
+                       'Weather_conditions', 'Road_traffic_density', 'Festival', 'City')
+
+    @classmethod
+    def from_records(cls, records: list) -> 'CustomBatchData':
+        return cls(pd.DataFrame.from_records(records, columns = [f.name for f in fields(CustomData)]))
+
+    def validate(self, known_categories: dict = None) -> dict:
+        '''Coerces the columns in place and returns {row position: [error, ...]}.'''
+        errors = {}
+
+        def flag(mask, message):
+            for i in np.flatnonzero(np.asarray(mask)):
+                errors.setdefault(int(i), []).append(message)
+
+        for name in (f.name for f in fields(CustomData)):
+            if name not in self.data:
+                self.data[name] = np.nan
+            column = self.data[name]
+
+            if name in self.numerical_fields:
+                coerced = pd.to_numeric(column, errors = 'coerce')
+                flag(coerced.isna() & column.notna(), f'{name} is not a number')
+                column = self.data[name] = coerced
+            else:
+                column = self.data[name] = column.astype(str).where(column.notna(), np.nan)
+
+            if name not in self.nullable_fields:
+                flag(column.isna(), f'{name} is required')
+
+        for name, categories in (known_categories or {}).items():
+            column = self.data[name]
+            flag(column.notna() & ~column.isin(categories), f'{name} has unknown category')
+
+        return errors
+
+    def get_data_as_dataframe(self, rows = None) -> pd.DataFrame:
+        try:
+            data = self.data if rows is None else self.data.iloc[rows]
+            data = data.rename(columns = {'Order_Date': 'Date_Order'}).reset_index(drop = True)
+
+            build_features(data)
+
+            hot_path.info('Batch DataFrame Gathered, %d rows', len(data))
+            return data
+
+        except Exception as e:
+            logging.error('FAILED Batch DataFrame Gathered')
+            logging.error(e)
+            raise CustomException(e, sys)
+
+    def predict(self, predict_pipeline: PredictPipeline) -> list:
+        '''Returns one result per input row, in input order.'''
+        errors = self.validate(predict_pipeline.known_categories())
+        valid_rows = np.array([i for i in range(len(self.data)) if i not in errors], dtype = int)
+
+        predictions = []
+        if len(valid_rows):
+            predictions = predict_pipeline.predict(self.get_data_as_dataframe(valid_rows))
+
+        results = [{'index': i, 'errors': errors[i]} if i in errors else None for i in range(len(self.data))]
+        for i, prediction in zip(valid_rows, predictions):
+            results[i] = {'index': int(i), 'prediction': float(prediction)}
+        return results
+
+
 # if __name__ == '__main__':
 #     data = CustomData('INDORES13DEL02',32.0,4.9,22.745049,75.892471,22.825049,75.972471,
 #                       '02-03-2022','23:20','23:30','Cloudy','Low',0,'Meal','motorcycle',2.0,'No','Metropolitian')
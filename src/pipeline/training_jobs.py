@@ -0,0 +1,225 @@
+import os, sys
+import hashlib
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.exception import CustomException
+from src.logger import logging, configure, run_log
+from src.utlility import file_lock
+from dataclasses import dataclass, field
+
+
+ACTIVE_STATES = ('queued', 'running')
+
+
+@dataclass
+class TrainingJobConfig:
+    jobs_dir = os.path.join('artifacts', 'jobs')
+    # One file per dataset with a queued or running job, shared by every serving process
+    active_dir = os.path.join('artifacts', 'jobs', 'active')
+    lock_path = os.path.join('artifacts', 'jobs', 'active.lock')
+    max_workers: int = int(os.environ.get('TRAINING_WORKERS', 1))
+    # Training runs at lower CPU priority than the serving process
+    niceness: int = 10
+
+
+def write_json(file_path: str, data: dict) -> None:
+    tmp_path = f'{file_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file)
+    os.replace(tmp_path, file_path)
+
+
+def read_json(file_path: str) -> dict:
+    with open(file_path) as file:
+        return json.load(file)
+
+
+def dataset_key(url: str, streaming: bool) -> str:
+    '''Fingerprint of the dataset a job trains on: path, size and mtime of a local file, the URL otherwise.'''
+    from src.stage_cache import source_fingerprint
+
+    source = source_fingerprint(url) or {'url': url}
+    return hashlib.sha256(json.dumps([source, bool(streaming)], sort_keys = True).encode()).hexdigest()
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@dataclass
+class JobStatus:
+    '''Status file of one job, written by the worker process at every stage boundary.'''
+
+    status_path: str
+    data: dict = field(default_factory = dict)
+
+    def update(self, **values) -> None:
+        self.data.update(values)
+        write_json(self.status_path, self.data)
+
+    def stage(self, name: str) -> None:
+        now = time.time()
+        stages = self.data.setdefault('stages', [])
+        if stages and stages[-1]['finished_at'] is None:
+            stages[-1]['finished_at'] = now
+            stages[-1]['seconds'] = round(now - stages[-1]['started_at'], 3)
+        if name is not None:
+            stages.append({'name': name, 'started_at': now, 'finished_at': None, 'seconds': None})
+        self.update(stage = name)
+
+
+def init_worker(niceness: int) -> None:
+    # Workers write only per-run logs, several processes rotating logs/app.log would clobber it
+    configure(file_path = None)
+    try:
+        os.nice(niceness)
+    except (AttributeError, OSError):
+        pass
+
+
+def run_training_job(job_dir: str, url: str, streaming: bool) -> None:
+    '''Entry point in the worker process, logs of this job go to its own file.'''
+    status = JobStatus(os.path.join(job_dir, 'status.json'), read_json(os.path.join(job_dir, 'status.json')))
+
+    with run_log(os.path.join(job_dir, 'train.log')):
+        run_stages(status, url, streaming)
+
+
+def run_stages(status: JobStatus, url: str, streaming: bool) -> None:
+    try:
+        from src.pipeline.training_pipeline import start_training, start_streaming_training
+
+        status.update(state = 'running', started_at = time.time())
+        if streaming:
+            status.stage('streaming_training')
+            start_streaming_training(url)
+        else:
+            status.update(stage_cache = start_training(url, progress = status.stage))
+        status.stage(None)
+        status.update(state = 'succeeded', finished_at = time.time())
+
+    except Exception as e:
+        logging.error('Training Job Failed')
+        logging.error(e)
+        status.stage(None)
+        status.update(state = 'failed', finished_at = time.time(), error = str(e))
+
+
+@dataclass
+class TrainingJobManager:
+    '''Runs training jobs on a process pool so HTTP workers never block on /train.\n
+        Jobs queue behind max_workers; submitting the same dataset while a job for
+        it is queued or running returns that job instead of starting another one.
+        The queued and running jobs are registered on disk under a file lock, so
+        this holds across the serving processes too; a job whose process died is
+        not counted.'''
+
+    config: TrainingJobConfig = field(default_factory = TrainingJobConfig)
+    executor: ProcessPoolExecutor = None
+    lock: threading.Lock = field(default_factory = threading.Lock)
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers = self.config.max_workers,
+                mp_context = multiprocessing.get_context('spawn'),
+                initializer = init_worker,
+                initargs = (self.config.niceness,)
+            )
+        return self.executor
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.config.jobs_dir, os.path.basename(job_id))
+
+    def active_path(self, key: str) -> str:
+        return os.path.join(self.config.active_dir, f'{key}.json')
+
+    def active_job(self, key: str) -> str:
+        '''Job id registered for key if it is still queued or running in a live process.'''
+        try:
+            entry = read_json(self.active_path(key))
+        except (OSError, ValueError):
+            return None
+        if self.status(entry['job_id']).get('state') in ACTIVE_STATES and process_alive(entry['pid']):
+            return entry['job_id']
+        return None
+
+    def submit(self, url: str, streaming: bool = False) -> str:
+        try:
+            key = dataset_key(url, streaming)
+            with self.lock, file_lock(self.config.lock_path):
+                job_id = self.active_job(key)
+                if job_id is not None:
+                    logging.info(f'Training Job {job_id} already queued for {url}')
+                    return job_id
+
+                job_id = uuid.uuid4().hex
+                job_dir = self.job_dir(job_id)
+                os.makedirs(job_dir, exist_ok = True)
+                write_json(os.path.join(job_dir, 'status.json'), {
+                    'job_id': job_id,
+                    'url': url,
+                    'streaming': bool(streaming),
+                    'state': 'queued',
+                    'submitted_at': time.time(),
+                    'stages': []
+                })
+
+                try:
+                    future = self.get_executor().submit(run_training_job, job_dir, url, bool(streaming))
+                except BrokenProcessPool:
+                    # A worker died earlier, start a fresh pool
+                    self.executor = None
+                    future = self.get_executor().submit(run_training_job, job_dir, url, bool(streaming))
+                os.makedirs(self.config.active_dir, exist_ok = True)
+                write_json(self.active_path(key), {'job_id': job_id, 'pid': os.getpid()})
+
+            # Outside the locks, a job that already finished runs the callback right here
+            future.add_done_callback(lambda f: self.finished(key, job_id, f))
+            logging.info(f'Training Job {job_id} queued for {url}')
+            return job_id
+
+        except Exception as e:
+            logging.error('FAILED Training Job Submit')
+            logging.error(e)
+            raise CustomException(e, sys)
+
+    def finished(self, key: str, job_id: str, future) -> None:
+        with self.lock, file_lock(self.config.lock_path):
+            try:
+                if read_json(self.active_path(key))['job_id'] == job_id:
+                    os.remove(self.active_path(key))
+            except (OSError, ValueError, KeyError):
+                pass
+
+        # A worker that died never got to write its own failure
+        if future.exception() is not None and self.status(job_id).get('state') in ACTIVE_STATES:
+            status = JobStatus(os.path.join(self.job_dir(job_id), 'status.json'), self.status(job_id))
+            status.update(state = 'failed', finished_at = time.time(), error = str(future.exception()))
+
+    def status(self, job_id: str) -> dict:
+        try:
+            return read_json(os.path.join(self.job_dir(job_id), 'status.json'))
+        except (OSError, ValueError):
+            return {}
+
+    def log(self, job_id: str) -> list:
+        try:
+            with open(os.path.join(self.job_dir(job_id), 'train.log')) as log_file:
+                return log_file.readlines()
+        except OSError:
+            return []
+
+
+training_jobs = TrainingJobManager()
@@ -7,19 +7,92 @@ from src.exception import CustomException
 from src.components.data_ingestion import DataIngestion
 from src.components.data_transformation import DataTransform
 from src.components.model_trainer import ModelTrainer
+from src.components.model_export import ModelExport
+from src.components.streaming_trainer import StreamingTrainer
+from src.components.incremental_trainer import IncrementalTrainer
+from src.components.time_feature import TimeFeature
+from src.components.metadata import METADATA_KEYS
+from src.components.cv_engine import gram_model_selection
+from src.components.model_selection import parallel_model_selection, halving_model_selection
+from src.utlility import evalute_model, read_split, file_lock
+from src.components.schema import memory_usage, read_csv
+from src.components.category_encoder import CategoryCodeEncoder
+from src.artifact_cache import file_sha256
+from src.stage_cache import StageCache, stage_key, code_digest, source_fingerprint
 
-def start_training(url: str, *args, **kwargs):
+def start_training(url: str, *args, progress = None, **kwargs) -> dict:
+    '''progress, if given, is called with the name of each stage as it starts.\n
+        Every stage is memoized in the stage cache under a hash of its inputs and
+        configuration, returns the report of which stages were hit and the memory
+        each one left behind (output size, process RSS and peak RSS).'''
+    progress = progress or (lambda stage: None)
+    stage_cache = StageCache()
+
+    def measured(stage: str, value):
+        stage_cache.annotate(stage, **memory_usage(value))
+        return value
+
+    progress('ingestion')
     data_ingestion = DataIngestion()
-    train_data_path, test_data_path = data_ingestion.initiate_data_ingestion(url, *args, **kwargs)
+    source_path = data_ingestion.fetch(url)
+    source = source_fingerprint(source_path)
+    ingest_key = source and stage_key('ingest', source, args, kwargs, code_digest(DataIngestion, read_csv))
+    raw_data_path = measured('ingest', stage_cache.run('ingest', ingest_key, lambda: data_ingestion.ingest(source_path, *args, **kwargs), outputs = (data_ingestion.config.raw_data_path,)))
+
+    # Downstream keys start from the raw content, a re-downloaded identical file still hits
+    split_key = stage_key('split', file_sha256(raw_data_path), data_ingestion.config.test_size, data_ingestion.config.random_state)
+    split_index_path = measured('split', stage_cache.run('split', split_key, data_ingestion.split, outputs = (data_ingestion.config.split_index_path,)))
+
+    progress('transformation')
     data_transform = DataTransform()
-    train_data, test_data, _= data_transform.initiate_data_transform(train_data_path, test_data_path)
+    features_key = stage_key('features', split_key, data_transform.input_columns(), code_digest(DataTransform, read_split))
+    load_features = lambda: measured('features', stage_cache.run('features', features_key, lambda: data_transform.load_features(raw_data_path, split_index_path)))
+
+    info = data_transform.metadata.get()
+    preprocess_key = stage_key('preprocess', features_key, {name: info[name] for name in METADATA_KEYS}, data_transform.config.target_col_name, code_digest(TimeFeature, CategoryCodeEncoder))
+    # Features are only loaded when the preprocessor has to be refit
+    preprocessor, train_data, test_data = measured('preprocess', stage_cache.run('preprocess', preprocess_key, lambda: data_transform.fit_transform(*load_features())))
+
+    progress('model_training')
     model_trainer = ModelTrainer()
-    model_trainer.initiate_model_training(train_data, test_data)
+    models = {name: model.get_params() for name, model in model_trainer.build_models().items()}
+    model_key = stage_key(
+        'model', preprocess_key, models, model_trainer.config.selection, model_trainer.halving_options(),
+        code_digest(ModelTrainer, evalute_model, gram_model_selection, parallel_model_selection, halving_model_selection)
+    )
+    best_model, model_report = measured('model', stage_cache.run('model', model_key, lambda: model_trainer.select_model(train_data, test_data)))
+    logging.info(f'Model Report: \n{model_report}')
+    # Starting point of later incremental updates from newly completed deliveries
+    incremental_trainer = IncrementalTrainer()
+    stats = incremental_trainer.initial_statistics(preprocessor, train_data)
+
+    # Published under the append lock, an append sees either the previous artifacts or all of these
+    with file_lock(incremental_trainer.config.lock_path):
+        preprocessor_path = data_transform.save_preprocessor(preprocessor)
+        model_path = model_trainer.save_model(best_model)
+        incremental_trainer.save_statistics(stats, model_path)
+
+        progress('model_export')
+        model_export = ModelExport()
+        model_export.initiate_model_export(preprocessor_path, model_path)
+
+    stage_cache.evict()
+    logging.info(f'Stage Cache Report: {stage_cache.report}')
+    return stage_cache.report
+
+def start_streaming_training(url: str, *args, **kwargs):
+    '''Chunked training for datasets that do not fit in memory.'''
+    streaming_trainer = StreamingTrainer()
+    # Every pass re-reads the source, read it from the local copy
+    source_path = DataIngestion().fetch(url)
+    preprocessor_path, model_path = streaming_trainer.initiate_streaming_training(source_path, *args, **kwargs)
+    model_export = ModelExport()
+    model_export.initiate_model_export(preprocessor_path, model_path)
 
 if __name__ == '__main__':
     data_ingestion = DataIngestion()
-    train_data_path, test_data_path = data_ingestion.initiate_data_ingestion()
+    raw_data_path, split_index_path = data_ingestion.initiate_data_ingestion()
     data_transform = DataTransform()
-    train_data, test_data, _= data_transform.initiate_data_transform(train_data_path, test_data_path)
+    train_data, test_data, _= data_transform.initiate_data_transform(raw_data_path, split_index_path)
     model_trainer = ModelTrainer()
     model_trainer.initiate_model_training(train_data, test_data)
\ No newline at end of file
@@ -0,0 +1,170 @@
+import os, sys
+import json
+import hashlib
+import shutil
+import time
+import uuid
+from src.exception import CustomException
+from src.logger import logging
+from src.artifact_cache import file_sha256
+
+from joblib import dump, load
+from dataclasses import dataclass, field
+
+
+@dataclass
+class StageCacheConfig:
+    cache_dir = os.path.join('artifacts', 'cache')
+    enabled: bool = os.environ.get('STAGE_CACHE', '1') != '0'
+    max_bytes: int = int(os.environ.get('STAGE_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+    # Seconds since an entry was last written or hit
+    max_age: float = float(os.environ.get('STAGE_CACHE_MAX_AGE', 7 * 24 * 3600))
+
+
+def stage_key(stage: str, *parts) -> str:
+    '''Hex sha256 of the stage name and its inputs / configuration.'''
+    payload = json.dumps([stage, *parts], sort_keys = True, default = repr)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def code_digest(*objs) -> str:
+    '''Hash of the source files defining objs, an edited stage never reuses old results.'''
+    return stage_key('code', *(file_sha256(sys.modules[obj.__module__].__file__) for obj in objs))
+
+
+def source_fingerprint(url: str) -> dict:
+    '''Identifies a local dataset by path, size and mtime without reading it.\n
+        None for anything else, such a source is never cached.'''
+    if os.path.exists(url):
+        stat = os.stat(url)
+        return {'path': os.path.abspath(url), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    return None
+
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names
+    )
+
+
+@dataclass
+class StageCache:
+    '''Content-addressed memoization of training stages.\n
+        Each entry is artifacts/cache/<stage>/<key>/ holding the joblib dumped result
+        and copies of the files the stage wrote. A stage whose key is already cached
+        restores those instead of running; report records which stages were hit.
+        Entries are evicted by age, then oldest first until under max_bytes.'''
+
+    config: StageCacheConfig = field(default_factory = StageCacheConfig)
+    report: dict = field(default_factory = dict)
+
+    def entry_dir(self, stage: str, key: str) -> str:
+        return os.path.join(self.config.cache_dir, stage, key)
+
+    def run(self, stage: str, key: str, fn, outputs: tuple = ()):
+        '''Returns fn() for this key, from the cache if present.\n
+            outputs are files fn writes, restored to the same paths on a hit.
+            key None runs fn uncached.'''
+        start = time.perf_counter()
+        if key is None or not self.config.enabled:
+            value = fn()
+            self.record(stage, key, 'uncached', start)
+            return value
+
+        entry_dir = self.entry_dir(stage, key)
+        if os.path.isdir(entry_dir):
+            try:
+                value = self.restore(entry_dir, outputs)
+                self.record(stage, key, 'hit', start)
+                return value
+            except Exception as e:
+                logging.warning(f'Stage Cache entry {entry_dir} unreadable, recomputing')
+                logging.warning(e)
+                shutil.rmtree(entry_dir, ignore_errors = True)
+
+        value = fn()
+        try:
+            self.store(entry_dir, value, outputs)
+        except Exception as e:
+            # A full disk or similar must not fail the training run
+            logging.warning(f'Stage Cache store failed for {stage}')
+            logging.warning(e)
+        self.record(stage, key, 'miss', start)
+        return value
+
+    def restore(self, entry_dir: str, outputs: tuple):
+        value = load(os.path.join(entry_dir, 'value.joblib'))
+        for index, file_path in enumerate(outputs):
+            os.makedirs(os.path.dirname(file_path) or '.', exist_ok = True)
+            tmp_path = f'{file_path}.{os.getpid()}.tmp'
+            shutil.copyfile(os.path.join(entry_dir, f'output-{index}'), tmp_path)
+            os.replace(tmp_path, file_path)
+        # Last use time drives eviction
+        os.utime(entry_dir)
+        return value
+
+    def store(self, entry_dir: str, value, outputs: tuple) -> None:
+        tmp_dir = f'{entry_dir}.{uuid.uuid4().hex}.tmp'
+        os.makedirs(tmp_dir)
+        try:
+            dump(value, os.path.join(tmp_dir, 'value.joblib'))
+            for index, file_path in enumerate(outputs):
+                shutil.copyfile(file_path, os.path.join(tmp_dir, f'output-{index}'))
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another run stored the same key first
+            shutil.rmtree(tmp_dir, ignore_errors = True)
+            if not os.path.isdir(entry_dir):
+                raise
+
+    def record(self, stage: str, key: str, result: str, start: float) -> None:
+        self.report[stage] = {
+            'result': result,
+            'key': key[:12] if key else None,
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+        logging.info(f'Stage Cache {stage}: {result}')
+
+    def annotate(self, stage: str, **values) -> None:
+        '''Adds figures such as memory use to the report entry of stage.'''
+        self.report.setdefault(stage, {}).update(values)
+
+    def entries(self) -> list:
+        '''(last used, size, path) of every cache entry.'''
+        entries = []
+        if not os.path.isdir(self.config.cache_dir):
+            return entries
+        for stage in os.listdir(self.config.cache_dir):
+            stage_dir = os.path.join(self.config.cache_dir, stage)
+            for key in os.listdir(stage_dir):
+                entry_dir = os.path.join(stage_dir, key)
+                if key.endswith('.tmp'):
+                    continue
+                entries.append((os.path.getmtime(entry_dir), directory_size(entry_dir), entry_dir))
+        return entries
+
+    def evict(self) -> list:
+        '''Removes entries older than max_age, then the least recently used over max_bytes.'''
+        try:
+            entries = sorted(self.entries())
+            now = time.time()
+            removed = [entry for entry in entries if now - entry[0] > self.config.max_age]
+            kept = [entry for entry in entries if entry not in removed]
+
+            total = sum(size for _, size, _ in kept)
+            while kept and total > self.config.max_bytes:
+                entry = kept.pop(0)
+                total -= entry[1]
+                removed.append(entry)
+
+            for _, _, entry_dir in removed:
+                shutil.rmtree(entry_dir, ignore_errors = True)
+            if removed:
+                logging.info(f'Stage Cache evicted {len(removed)} entries, {total} bytes kept')
+            return [entry_dir for _, _, entry_dir in removed]
+
+        except Exception as e:
+            logging.error('FAILED Stage Cache Eviction')
+            logging.error(e)
+            raise CustomException(e, sys)
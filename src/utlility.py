@@ -1,23 +1,48 @@
 import os, sys
+import hashlib
+import hmac
+import threading
+import time
+from contextlib import contextmanager
 from src.exception import CustomException
 from src.logger import logging
-from joblib import load, dump
+from src.metrics import span
 import numpy as np
 import pandas as pd
-import redis
-from dataclasses import dataclass
-from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+from dataclasses import dataclass, field, asdict
 from typing import Any
 
 # Radius of Earth (km)
 Earth_Radius = 6371
 
+@contextmanager
+def file_lock(lock_path: str):
+    '''Exclusive lock across processes, e.g. appends and trainings from several serving workers run one at a time.'''
+    os.makedirs(os.path.dirname(lock_path), exist_ok = True)
+    with open(lock_path, 'a') as lock_file:
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 def saveObject(file_path: str, obj: object) -> None:
+    from joblib import dump
+
     try:
         dir_name = os.path.dirname(file_path)
         os.makedirs(dir_name, exist_ok = True)
 
-        dump(obj, file_path)
+        # Write next to the target then swap it in, so readers never see a partial file
+        tmp_path = f'{file_path}.{os.getpid()}.tmp'
+        dump(obj, tmp_path)
+        os.replace(tmp_path, file_path)
         logging.info(f'Successful Save Object at {file_path}')
 
     except Exception as e:
@@ -25,9 +50,13 @@ def saveObject(file_path: str, obj: object) -> None:
         logging.error(e)
         raise CustomException(e, sys)
     
-def loadObject(file_path: str) -> None:
+def loadObject(file_path: str, mmap_mode: str = None) -> None:
+    '''joblib.load, mmap_mode = 'r' maps the numpy arrays of the file read-only instead of copying them,
+        every process loading the same file then shares one copy in the page cache.'''
+    from joblib import load
+
     try:
-        obj = load(file_path)
+        obj = load(file_path, mmap_mode = mmap_mode)
         logging.info(f'Successful Read Object at {file_path}')
         return obj
     
@@ -37,6 +66,26 @@ def loadObject(file_path: str) -> None:
         raise CustomException(e, sys)
 
 
+def read_split(raw_data_path: str, split_index_path: str, columns: list = None, categorical: list = None) -> tuple:
+    '''Returns (train, test) DataFrames with only the requested columns.\n
+        The Parquet file is memory-mapped and rows are taken on the Arrow table,
+        so the unused columns are never decoded. categorical columns are read as
+        dictionaries and come back as pandas Categorical, codes instead of strings.'''
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(raw_data_path, columns = columns, memory_map = True, read_dictionary = categorical)
+    with np.load(split_index_path) as split:
+        train_idx, test_idx = split['train'], split['test']
+
+    def to_frame(part):
+        frame = part.to_pandas()
+        # Arrow nulls come back as None in object columns, the imputers expect NaN
+        strings = frame.select_dtypes('object').columns
+        frame[strings] = frame[strings].where(frame[strings].notna(), np.nan)
+        return frame
+
+    return to_frame(table.take(train_idx)), to_frame(table.take(test_idx))
+
 
 def format_24_hour(Time: str) -> Any:
     '''Returns string/NaN, If input is NaN then it return NaN, else based on the conditions.\n
@@ -72,8 +121,9 @@ def globe_distance(data: pd.DataFrame, x1: str, y1: str, x2: str, y2: str) -> fl
     """Return the distance between (x1, y1) and (x2, y2), Where (x1, y1) are latitude and longitude of first location and 
     (x2, y2) are latitude and longitude of second location."""
 
-    x1, y1 = np.abs(data[x1]), np.abs(data[y1])
-    x2, y2 = np.abs(data[x2]), np.abs(data[y2])
+    # float64 math, coordinates may be stored as float32
+    x1, y1 = np.abs(data[x1].astype(np.float64)), np.abs(data[y1].astype(np.float64))
+    x2, y2 = np.abs(data[x2].astype(np.float64)), np.abs(data[y2].astype(np.float64))
     
     lat_diff = degree_radian(x2 - x1) / 2
     lon_diff = degree_radian(y2 - y1) / 2
@@ -85,9 +135,11 @@ def fetch_redis(connection, key, name = 'default') -> Any:
     try:
         logging.info('Try Fetch Data Redis Cloud')
         if key == 'users':
-            data = connection.hget('users', name)
+            with span('redis.hget'):
+                data = connection.hget('users', name)
         else:
-            data = connection.lrange(key, 0, -1)
+            with span('redis.lrange'):
+                data = connection.lrange(key, 0, -1)
 
         logging.info('Successful Fetch Data Redis Cloud')
         return data
@@ -99,34 +151,134 @@ def fetch_redis(connection, key, name = 'default') -> Any:
     
 
 
-def redis_connect(host: str, port: int, password: str, db: int, ssl: bool, **kwargs) -> redis.StrictRedis:
+@dataclass
+class RedisConfig:
+    '''Connection settings for the metadata/users Redis, overridable with REDIS_* env vars (e.g. a local stand-in).'''
+    host: str = os.environ.get('REDIS_HOST', 'delivery-time-info.redis.cache.windows.net')
+    port: int = int(os.environ.get('REDIS_PORT', 6380))
+    db: int = int(os.environ.get('REDIS_DB', 0))
+    password: str = os.environ.get('REDIS_PASSWORD', 'g1ohvaqFaRceQYOUFfG14fPOh6rp1JuoNAzCaHTjM9s=')
+    ssl: bool = os.environ.get('REDIS_SSL', '1') == '1'
+
+
+# One client (and so one connection pool) per distinct connection settings, per process
+redis_clients = {}
+redis_clients_lock = threading.Lock()
+# Settings of these types compare by value, anything else (a Retry, a ConnectionPool) cannot key the pool
+POOLABLE_TYPES = (str, int, float, bool, type(None))
+
+def redis_connect(host: str, port: int, password: str, db: int, ssl: bool, **kwargs) -> 'redis.StrictRedis':
+    '''Returns the pooled client for these settings, the TLS handshake and ping happen only once.\n
+        With an object among kwargs (e.g. retry = Retry(...)) the settings have no stable
+        key, a new client is returned every call and the caller must keep it.\n
+        redis is imported here, a serving process that never logs in or trains never loads it.'''
+    poolable = all(isinstance(value, POOLABLE_TYPES) for value in kwargs.values())
+    key = (host, port, password, db, ssl, tuple(sorted(kwargs.items()))) if poolable else None
+    cnct = redis_clients.get(key) if poolable else None
+    if cnct is not None:
+        return cnct
+
     try: 
-        cnct = redis.StrictRedis(
-            host = host,
-            port = port,
-            db = db,
-            password = password,
-            ssl = ssl,
-            **kwargs
-        )
-        if cnct.ping():
-            logging.info('Connection Successful Redis Cloud')
+        with redis_clients_lock:
+            cnct = redis_clients.get(key) if poolable else None
+            if cnct is None:
+                import redis
+
+                cnct = redis.StrictRedis(
+                    host = host,
+                    port = port,
+                    db = db,
+                    password = password,
+                    ssl = ssl,
+                    **kwargs
+                )
+                with span('redis.connect'):
+                    if cnct.ping():
+                        logging.info('Connection Successful Redis Cloud')
+                if poolable:
+                    redis_clients[key] = cnct
         return cnct
     except Exception as e:
         logging.error('Connection Failed Redis Cloud')
         logging.error(e)
         raise CustomException(e, sys)
+
+
+@dataclass
+class CredentialCache:
+    '''Short-TTL cache of sha256 digests of the users' stored credentials.\n
+        A cached digest that does not match is re-fetched once, so a password
+        changed in Redis is picked up immediately instead of after the TTL.'''
+
+    ttl: float = float(os.environ.get('CREDENTIAL_CACHE_TTL', 60))
+    entries: dict = field(default_factory = dict)
+    lock: threading.Lock = field(default_factory = threading.Lock)
+
+    def fetch(self, user_name: str) -> str:
+        stored = fetch_redis(redis_connect(**asdict(RedisConfig()), decode_responses = True), 'users', user_name)
+        if stored is None:
+            return None
+
+        digest = hashlib.sha256(stored.encode()).hexdigest()
+        with self.lock:
+            self.entries[user_name] = (digest, time.monotonic() + self.ttl)
+        return digest
+
+    def check(self, user_name: str, password: str) -> bool:
+        given = hashlib.sha256(password.encode()).hexdigest()
+
+        with self.lock:
+            digest, expires = self.entries.get(user_name, (None, 0))
+        if digest is not None and time.monotonic() < expires:
+            if hmac.compare_digest(digest, given):
+                return True
+            logging.info('Cached Credential Mismatch, refetching')
+
+        digest = self.fetch(user_name)
+        return digest is not None and hmac.compare_digest(digest, given)
+
+    def invalidate(self, user_name: str = None) -> None:
+        with self.lock:
+            if user_name is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(user_name, None)
+
+
+credential_cache = CredentialCache()
     
 
-def evalute_model(X_train: np.array, X_test: np.array, y_train: np.array, y_test: np.array, models: dict) -> pd.DataFrame:
+def evalute_model(X_train: np.array, X_test: np.array, y_train: np.array, y_test: np.array, models: dict,
+                  selection: str = 'fit', n_jobs: int = 1, halving: dict = None) -> pd.DataFrame:
+    '''Fits every model and reports its test metrics.\n
+        selection = 'fit': each model is fit as given (the *CV estimators run their own CV)\n
+        selection = 'parallel': (model, fold) CV tasks over a process pool of n_jobs\n
+        selection = 'gram': one shared pass of per-fold Gram matrices for every model and alpha\n
+        selection = 'halving': successive halving of the (model, alpha) candidates on growing
+        stratified subsamples, halving holds its min_rows / factor / random_state options\n
+        For 'parallel', 'gram' and 'halving' the *CV models are replaced in models by the plain
+        estimator refit with the best alpha.'''
+    from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+
     try:
         report = []
 
+        if selection == 'parallel':
+            from src.components.model_selection import parallel_model_selection
+            models.update(parallel_model_selection(X_train, y_train, models, n_jobs = n_jobs))
+        elif selection == 'gram':
+            from src.components.cv_engine import gram_model_selection
+            models.update(gram_model_selection(X_train, y_train, models))
+        elif selection == 'halving':
+            from src.components.model_selection import halving_model_selection
+            models.update(halving_model_selection(X_train, y_train, models, n_jobs = n_jobs, **(halving or {})))
+
         for model in models:
             MODEL = models[model]
 
             # Model Training
-            MODEL.fit(X_train, y_train)
+            if selection == 'fit':
+                MODEL.fit(X_train, y_train)
 
             # Predict Test Data
             y_pred = MODEL.predict(X_test)
@@ -150,33 +302,8 @@ def evalute_model(X_train: np.array, X_test: np.array, y_train: np.array, y_test
 
 
 def add_time_feature(data: pd.DataFrame) -> None:
-    
-    # Appling the format_24_hour function on both Time_Orderd and Time_Order_picked columns
-    data['Time_Orderd'] = data.Time_Orderd.apply(format_24_hour)
-    data['Time_Order_picked'] = data.Time_Order_picked.apply(format_24_hour)
-
-    order = data[(data.Time_Order_picked.notna() & data.Time_Orderd.notna())]
-
-
-    # Converting the Time_Orderd into DateTime object
-    order_time = pd.to_datetime(order['Time_Orderd'])
-
-    # Converting the Time_Order_picked to DateTime object
-    order_picked = pd.to_datetime(order['Time_Order_picked'])
-
-    # Median difference between order picked and order time(seconds)
-    median_order_pick_time = (order_picked - order_time).dt.seconds.median()
-    
-    # Selecting only those columns where Time_Ordered is NaN and Time_Order_picked is not NaN
-    order = data.loc[data.Time_Orderd.isna() & data.Time_Order_picked.notna()]
-
-    # Converting into DateTime object
-    order_picked = pd.to_datetime(order['Time_Order_picked'])
-
-    # Here subtracting Median Order Picking Time (600 seconds) from Order Picked Time
-    data['Time_Orderd'].fillna(
-        value = (order_picked - pd.Timedelta(seconds = median_order_pick_time)).dt.strftime('%H:%M'), 
-        inplace = True
-        )
+    '''Adds order_hour in place, learning the median order-to-pickup gap from data itself.\n
+        The training and serving paths use the fitted TimeFeature inside the preprocessor instead.'''
+    from src.components.time_feature import TimeFeature
 
-    data['order_hour'] = data['Time_Orderd'].str.split(':', expand = True)[0].astype(float)
+    data['order_hour'] = TimeFeature().fit(data).transform(data)['order_hour']
@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    '''Points redis.StrictRedis at an in-memory fakeredis server and returns that server.\n
+        Every client the code under test creates is counted in server.clients.'''
+    fakeredis = pytest.importorskip('fakeredis')
+    import redis
+    from src import utlility
+
+    server = fakeredis.FakeServer()
+    server.clients = 0
+
+    def client(**kwargs):
+        server.clients += 1
+        return fakeredis.FakeStrictRedis(server = server, **kwargs)
+
+    monkeypatch.setattr(redis, 'StrictRedis', client)
+    monkeypatch.setattr(utlility, 'redis_clients', {})
+    return server
+
+
+@pytest.fixture
+def redis_client(fake_redis):
+    import fakeredis
+    return fakeredis.FakeStrictRedis(server = fake_redis, decode_responses = True)
+
+
+def seed_workdir(workdir) -> None:
+    '''Copies data-info.json and test.csv into workdir/artifacts and seeds the metadata
+        snapshot from data-info.json, so no stage waits on Redis.'''
+    import json
+    import shutil
+    import time
+
+    os.makedirs(os.path.join(workdir, 'artifacts'), exist_ok = True)
+    for name in ('data-info.json', 'test.csv'):
+        shutil.copy(os.path.join(ROOT, 'artifacts', name), os.path.join(workdir, 'artifacts', name))
+
+    from src.components.metadata import METADATA_KEYS
+    with open(os.path.join(ROOT, 'artifacts', 'data-info.json')) as file:
+        info = json.load(file)
+    with open(os.path.join(workdir, 'artifacts', 'metadata-snapshot.json'), 'w') as file:
+        json.dump({**{name: info[name] for name in METADATA_KEYS}, 'version': 1, 'fetched_at': time.time()}, file)
+
+
+@pytest.fixture(scope = 'session')
+def trained_dir(tmp_path_factory):
+    '''Scratch directory with artifacts/ trained by start_training on artifacts/test.csv.'''
+    workdir = tmp_path_factory.mktemp('trained')
+    seed_workdir(workdir)
+
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from src.pipeline.training_pipeline import start_training
+        start_training(os.path.join('artifacts', 'test.csv'))
+    finally:
+        os.chdir(previous)
+    return workdir
+
+
+@pytest.fixture
+def seeded_dir(tmp_path, monkeypatch):
+    '''Untrained scratch directory with the seeded artifacts/, as the working directory.'''
+    seed_workdir(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def workdir(trained_dir, monkeypatch):
+    '''Runs the test from the trained scratch directory, artifact paths are relative.'''
+    monkeypatch.chdir(trained_dir)
+    return trained_dir
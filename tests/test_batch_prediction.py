@@ -0,0 +1,25 @@
+from dataclasses import asdict
+
+from src.pipeline.prediction_pipeline import PredictPipeline, CustomBatchData
+
+import pytest
+
+from test_prediction_cache import order
+
+
+def test_batch_and_single_agree_on_unseen_categories(workdir):
+    unseen = order(Delivery_person_ID = 'NEWCITYRES99DEL01', Weather_conditions = 'Hail')
+    pipeline = PredictPipeline()
+    single = pipeline.predict(unseen.get_data_as_dataframe())[0]
+
+    results = CustomBatchData.from_records([asdict(order()), asdict(unseen)]).predict(pipeline)
+    assert 'errors' not in results[1]
+    assert results[1]['prediction'] == pytest.approx(single)
+
+
+def test_batch_still_reports_invalid_rows(workdir):
+    records = [asdict(order()), asdict(order(Delivery_person_Age = 'old')), asdict(order(Delivery_person_ID = None))]
+    results = CustomBatchData.from_records(records).predict(PredictPipeline())
+    assert 'prediction' in results[0]
+    assert results[1]['errors'] == ['Delivery_person_Age is not a number']
+    assert results[2]['errors'] == ['Delivery_person_ID is required']
@@ -0,0 +1,131 @@
+import os
+import shutil
+import subprocess
+import sys
+
+from src.components.schema import read_csv
+from src.pipeline.bulk_scoring import BulkScorer, BulkScoringConfig, ChunkWriter
+from src.pipeline.prediction_pipeline import PredictPipeline, build_features
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNK_SIZE = 3000
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def orders(workdir, tmp_path) -> str:
+    '''test.csv without its target and with an empty Vehicle_condition, as orders to score arrive.'''
+    data = pd.read_csv(os.path.join('artifacts', 'test.csv'), dtype = str, keep_default_na = False)
+    data = data.drop(columns = ['Time_taken (min)'])
+    data.loc[10, 'Vehicle_condition'] = ''
+    path = str(tmp_path / 'orders.csv')
+    data.to_csv(path, index = False)
+    return path
+
+
+def scorer(**config) -> BulkScorer:
+    return BulkScorer(BulkScoringConfig(**{'chunk_size': CHUNK_SIZE, 'workers': 2, **config}))
+
+
+def interrupt_after(monkeypatch, chunks: int) -> None:
+    '''The writer dies inside chunk number chunks, after writing part of it.'''
+    write = ChunkWriter.write
+
+    def failing(self, index, scored):
+        if index == chunks:
+            write(self, index, scored.iloc[:len(scored) // 2])
+            raise Interrupted()
+        return write(self, index, scored)
+
+    monkeypatch.setattr(ChunkWriter, 'write', failing)
+
+
+def read_output(path: str) -> pd.DataFrame:
+    return pd.read_csv(path) if path.endswith('.csv') else pd.read_parquet(path)
+
+
+def test_output_is_in_input_order_and_matches_predict(orders, tmp_path):
+    output = str(tmp_path / 'scored.csv')
+    report = scorer().score(orders, output)
+
+    data = read_csv(orders)
+    expected = PredictPipeline().predict(build_features(data.rename(columns = {'Order_Date': 'Date_Order'})))
+    scored = read_output(output)
+    assert report['rows'] == report['total_rows'] == len(data)
+    assert scored['ID'].tolist() == data['ID'].tolist()
+    # The empty Vehicle_condition is imputed like /predict does
+    np.testing.assert_allclose(scored['prediction'], expected, rtol = 1e-6)
+
+
+@pytest.mark.parametrize('name', ['scored.csv', 'scored_parts'])
+def test_resume_matches_a_clean_run(orders, tmp_path, monkeypatch, name):
+    clean, resumed = str(tmp_path / 'clean' / name), str(tmp_path / 'resumed' / name)
+    os.makedirs(os.path.dirname(clean))
+    os.makedirs(os.path.dirname(resumed))
+    scorer().score(orders, clean)
+
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 1)
+        with pytest.raises(Interrupted):
+            scorer().score(orders, resumed)
+
+    report = scorer().score(orders, resumed)
+    assert report['resumed_at'] == CHUNK_SIZE
+    assert report['rows'] + CHUNK_SIZE == report['total_rows']
+    if name.endswith('.csv'):
+        with open(clean, 'rb') as a, open(resumed, 'rb') as b:
+            assert a.read() == b.read()
+    else:
+        assert sorted(os.listdir(clean)) == sorted(os.listdir(resumed))
+    pd.testing.assert_frame_equal(read_output(clean), read_output(resumed))
+
+
+def test_finished_run_is_a_no_op_and_restart_rescores(orders, tmp_path):
+    output = str(tmp_path / 'scored.csv')
+    scorer().score(orders, output)
+
+    again = scorer().score(orders, output)
+    assert again['rows'] == 0 and again['resumed_at'] == again['total_rows']
+
+    restarted = scorer().score(orders, output, restart = True)
+    assert restarted['resumed_at'] == 0 and restarted['rows'] == restarted['total_rows']
+
+
+def test_checkpoint_of_another_chunk_size_or_model_is_refused(orders, tmp_path, monkeypatch):
+    output = str(tmp_path / 'scored.csv')
+    model_path = str(tmp_path / 'model.joblib')
+    shutil.copy(os.path.join('artifacts', 'model.joblib'), model_path)
+    monkeypatch.setattr(BulkScoringConfig, 'model_path', model_path)
+
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 1)
+        with pytest.raises(Interrupted):
+            scorer().score(orders, output)
+
+    with pytest.raises(ValueError, match = 'use --restart'):
+        scorer(chunk_size = CHUNK_SIZE * 2).score(orders, output)
+
+    with open(model_path, 'ab') as file:
+        file.write(b'\0')
+    with pytest.raises(ValueError, match = 'use --restart'):
+        scorer().score(orders, output)
+
+
+def test_cli_refuses_a_foreign_checkpoint_until_restart(orders, tmp_path):
+    output = str(tmp_path / 'scored.csv')
+    command = [sys.executable, '-m', 'src.pipeline.bulk_scoring', orders, output, '--workers', '2']
+    env = {**os.environ, 'PYTHONPATH': ROOT}
+
+    subprocess.run(command + ['--chunk-size', str(CHUNK_SIZE)], env = env, check = True, capture_output = True)
+    refused = subprocess.run(command + ['--chunk-size', str(CHUNK_SIZE * 2)], env = env, capture_output = True, text = True)
+    assert refused.returncode == 2 and 'use --restart' in refused.stderr
+
+    subprocess.run(command + ['--chunk-size', str(CHUNK_SIZE * 2), '--restart'], env = env, check = True, capture_output = True)
+    assert len(pd.read_csv(output)) == len(read_csv(orders))
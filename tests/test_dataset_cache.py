@@ -0,0 +1,110 @@
+import gzip
+import io
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.components.dataset_cache import DatasetCache
+from src.exception import CustomException
+
+import pytest
+
+CSV = b'ID,Delivery_person_Age,Time_taken (min)\n' + b''.join(b'0x%04x,%d,%d\n' % (i, 20 + i % 30, 10 + i % 40) for i in range(5000))
+ETAG = '"v1"'
+
+
+class DatasetHandler(BaseHTTPRequestHandler):
+    '''Serves server.payload with an ETag, answering conditional and Range requests.\n
+        While server.drop_after is set, the body is cut after that many bytes.'''
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        body = server.payload
+
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        start = 0
+        if self.headers.get('Range') and self.headers.get('If-Range') == ETAG:
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+        else:
+            self.send_response(200)
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.end_headers()
+
+        if server.drop_after is not None:
+            self.wfile.write(body[start:start + server.drop_after])
+            server.drop_after = None
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), DatasetHandler)
+    httpd.payload, httpd.drop_after, httpd.requests = CSV, None, []
+    httpd.url = f'http://127.0.0.1:{httpd.server_address[1]}/orders.csv'
+    thread = threading.Thread(target = httpd.serve_forever, daemon = True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def read(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_local_path_is_returned_unchanged():
+    assert DatasetCache().fetch('artifacts/test.csv') == 'artifacts/test.csv'
+
+
+def test_unchanged_source_is_revalidated_with_304(server):
+    cache = DatasetCache()
+    path = cache.fetch(server.url)
+    assert read(path) == CSV
+
+    assert cache.fetch(server.url) == path
+    assert server.requests[-1].get('If-None-Match') == ETAG
+    assert read(path) == CSV
+
+
+def test_gzip_payload_is_decompressed(server):
+    # Two gzip members, as `cat a.gz b.gz` writes
+    server.payload = gzip.compress(CSV[:len(CSV) // 2]) + gzip.compress(CSV[len(CSV) // 2:])
+    assert read(DatasetCache().fetch(server.url)) == CSV
+
+
+def test_zip_payload_is_extracted(server):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('orders.csv', CSV)
+    server.payload = buffer.getvalue()
+    assert read(DatasetCache().fetch(server.url)) == CSV
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_dropped_connection_resumes_with_range(server, compress):
+    server.payload = gzip.compress(CSV) if compress else CSV
+    server.drop_after = len(server.payload) // 3
+    cache = DatasetCache()
+
+    with pytest.raises(CustomException):
+        cache.fetch(server.url)
+
+    path = cache.fetch(server.url)
+    assert server.requests[-1].get('Range') == f'bytes={len(server.payload) // 3}-'
+    assert server.requests[-1].get('If-Range') == ETAG
+    assert read(path) == CSV
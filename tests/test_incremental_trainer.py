@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+
+from src.components.incremental_trainer import IncrementalTrainer, InvalidDeliveries
+from src.utlility import file_lock
+from src.components.schema import read_csv
+from src.artifact_cache import file_sha256
+
+import pytest
+
+
+@pytest.fixture
+def deliveries(workdir):
+    return read_csv(os.path.join('artifacts', 'test.csv'), nrows = 50)
+
+
+@pytest.fixture
+def client(workdir, monkeypatch):
+    monkeypatch.setenv('WARM_ARTIFACTS', '0')
+    import app
+    monkeypatch.setattr(app, 'is_logined', True)
+    return app.app.test_client()
+
+
+def test_missing_column_is_rejected_before_any_write(deliveries):
+    trainer = IncrementalTrainer()
+    before = file_sha256(trainer.config.model_path)
+    with pytest.raises(InvalidDeliveries, match = 'Weather_conditions'):
+        trainer.append(deliveries.drop(columns = ['Weather_conditions']))
+    assert file_sha256(trainer.config.model_path) == before
+
+
+def test_unencodable_values_are_rejected(deliveries):
+    deliveries['Delivery_person_Age'] = 'old'
+    with pytest.raises(InvalidDeliveries):
+        IncrementalTrainer().append(deliveries)
+
+
+def test_append_waits_for_the_training_lock(deliveries):
+    trainer = IncrementalTrainer()
+    released = threading.Event()
+
+    def hold():
+        with file_lock(trainer.config.lock_path):
+            time.sleep(0.3)
+            released.set()
+
+    holder = threading.Thread(target = hold)
+    holder.start()
+    time.sleep(0.05)
+    # Not a write, the missing column is reported once the lock is acquired
+    with pytest.raises(InvalidDeliveries):
+        trainer.append(deliveries.drop(columns = ['City']))
+    assert released.is_set()
+    holder.join()
+
+
+def test_route_maps_validation_failures_to_400(client, deliveries):
+    response = client.post('/train/append', data = deliveries.drop(columns = ['City']).to_csv(index = False), content_type = 'text/csv')
+    assert response.status_code == 400
+    assert 'City' in response.get_json()['error']
+
+    response = client.post('/train/append', json = {'deliveries': 'not a list'})
+    assert response.status_code == 400
@@ -0,0 +1,61 @@
+import os
+
+from src.components.schema import read_csv
+from src.pipeline.kernel_predictor import KernelPredictor
+from src.pipeline.prediction_pipeline import PredictPipeline, build_features
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The kernel computes in float32, sklearn in float64
+TOLERANCE = 1e-4
+
+
+@pytest.fixture
+def features(workdir) -> pd.DataFrame:
+    data = read_csv(os.path.join('artifacts', 'test.csv')).drop(columns = ['Time_taken (min)'])
+    return build_features(data.rename(columns = {'Order_Date': 'Date_Order'}))
+
+
+def row_of(features: pd.DataFrame, i: int) -> dict:
+    return {key: (None if pd.isna(value) else value) for key, value in features.iloc[i].items()}
+
+
+def test_batch_matches_sklearn(features):
+    expected = PredictPipeline().predict(features)
+    predicted = KernelPredictor().predict({col: features[col].to_numpy() for col in features.columns})
+    assert predicted.shape == expected.shape
+    np.testing.assert_allclose(predicted, expected, atol = TOLERANCE)
+
+
+def test_single_row_matches_sklearn(features):
+    predictor, pipeline = KernelPredictor(), PredictPipeline()
+    for i in (0, 1, len(features) // 2, len(features) - 1):
+        expected = pipeline.predict(features.iloc[[i]])[0]
+        assert predictor.predict_row(row_of(features, i)) == pytest.approx(expected, abs = TOLERANCE)
+
+
+def test_unseen_category_matches_sklearn(features):
+    unseen = features.iloc[[0]].copy()
+    unseen['Delivery_person_ID'] = 'NEWCITYRES99DEL01'
+    unseen['Weather_conditions'] = 'Hail'
+    expected = PredictPipeline().predict(unseen)[0]
+
+    predictor = KernelPredictor()
+    assert predictor.predict_row(row_of(unseen, 0)) == pytest.approx(expected, abs = TOLERANCE)
+    batch = predictor.predict({col: unseen[col].to_numpy() for col in unseen.columns})
+    assert batch[0] == pytest.approx(expected, abs = TOLERANCE)
+
+
+@pytest.mark.parametrize('ordered', ['1:2', ' 10:30 junk', '10:30:001', '१०:३०', '9:05', '9:05:30', ' 23:12 '])
+def test_order_time_shapes_match_sklearn(features, ordered):
+    # Unparsable order times fall back to pick-up time minus the median gap on both paths
+    row = features.iloc[[0]].copy()
+    row['Time_Orderd'] = ordered
+    expected = PredictPipeline().predict(row)[0]
+
+    predictor = KernelPredictor()
+    assert predictor.predict_row(row_of(row, 0)) == pytest.approx(expected, abs = TOLERANCE)
+    batch = predictor.predict({col: row[col].to_numpy() for col in row.columns})
+    assert batch[0] == pytest.approx(expected, abs = TOLERANCE)
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+from src.logger import worker_log_path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORK_SCRIPT = '''
+import os
+from src.logger import logging, flush, shutdown
+
+logging.info('parent before fork')
+pid = os.fork()
+if pid == 0:
+    logging.info('worker %d', os.getpid())
+    flush()
+    shutdown()
+    os._exit(0)
+os.waitpid(pid, 0)
+logging.info('parent after fork')
+print(pid)
+'''
+
+
+def test_worker_log_path():
+    assert worker_log_path(os.path.join('logs', 'app.log'), 42) == os.path.join('logs', 'app.42.log')
+
+
+def test_forked_worker_writes_its_own_file(tmp_path):
+    result = subprocess.run(
+        [sys.executable, '-c', FORK_SCRIPT], cwd = tmp_path, capture_output = True, text = True,
+        env = {**os.environ, 'PYTHONPATH': ROOT}, check = True
+    )
+    pid = int(result.stdout)
+
+    with open(tmp_path / 'logs' / 'app.log') as file:
+        shared = file.read()
+    with open(tmp_path / 'logs' / f'app.{pid}.log') as file:
+        worker = file.read()
+    assert 'parent before fork' in shared and 'parent after fork' in shared
+    assert f'worker {pid}' in worker and f'worker {pid}' not in shared
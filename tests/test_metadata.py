@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import time
+
+from src.components.metadata import MetadataProvider, METADATA_KEYS
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def seed(tmp_path, monkeypatch) -> dict:
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('artifacts')
+    shutil.copy(os.path.join(ROOT, 'artifacts', 'data-info.json'), os.path.join('artifacts', 'data-info.json'))
+    with open(os.path.join('artifacts', 'data-info.json')) as file:
+        info = json.load(file)
+    return {name: info[name] for name in METADATA_KEYS}
+
+
+@pytest.fixture
+def seeded_redis(redis_client, seed):
+    for name, key in METADATA_KEYS.items():
+        redis_client.rpush(key, *seed[name])
+    return redis_client
+
+
+def wait_for_refresh(provider: MetadataProvider, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while provider.refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_first_get_fetches_and_saves_snapshot(fake_redis, seeded_redis, seed):
+    provider = MetadataProvider()
+    data = provider.get()
+    assert {name: data[name] for name in METADATA_KEYS} == seed
+    assert provider.read_snapshot()['version'] == 1
+
+
+def test_fresh_snapshot_does_not_touch_redis(fake_redis, seed):
+    provider = MetadataProvider()
+    provider.write_snapshot(seed)
+    fake_redis.connected = False
+
+    assert provider.get()['city'] == seed['city']
+    assert fake_redis.clients == 0
+
+
+def test_stale_snapshot_is_served_and_refreshed(fake_redis, seeded_redis, seed):
+    provider = MetadataProvider()
+    provider.write_snapshot({**seed, 'city': ['Urban']}, stale = True)
+
+    assert provider.get()['city'] == ['Urban']
+    wait_for_refresh(provider)
+    snapshot = provider.read_snapshot()
+    assert snapshot['city'] == seed['city']
+    assert snapshot['version'] == 2 and snapshot['fetched_at'] > 0
+
+
+def test_unchanged_content_keeps_version(fake_redis, seeded_redis, seed):
+    provider = MetadataProvider()
+    provider.write_snapshot(seed)
+    assert provider.refresh()['version'] == 1
+
+
+def test_redis_down_falls_back_to_seed_once(fake_redis, seed):
+    fake_redis.connected = False
+    provider = MetadataProvider()
+
+    data = provider.get()
+    assert {name: data[name] for name in METADATA_KEYS} == seed
+    assert fake_redis.clients == 1
+
+    # The seed is now a stale snapshot: served at once, only the background refresh tries Redis
+    snapshot = provider.read_snapshot()
+    assert snapshot['fetched_at'] == 0.0
+    fresh = MetadataProvider()
+    fresh.refresh_in_background = lambda: None
+    assert fresh.get()['city'] == seed['city']
+    assert fake_redis.clients == 1
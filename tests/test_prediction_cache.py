@@ -0,0 +1,101 @@
+from src.pipeline.prediction_cache import PredictionCache, PredictionCacheConfig, feature_key
+from src.pipeline.prediction_pipeline import CustomData
+
+import pytest
+
+
+def order(**changes) -> CustomData:
+    fields = dict(
+        Delivery_person_ID = 'INDORES13DEL02', Delivery_person_Age = 37.0, Delivery_person_Ratings = 4.9,
+        Restaurant_latitude = 22.745049, Restaurant_longitude = 75.892471,
+        Delivery_location_latitude = 22.765049, Delivery_location_longitude = 75.912471,
+        Order_Date = '19-03-2022', Time_Orderd = '11:30:00', Time_Order_picked = '11:45:00',
+        Weather_conditions = 'Sunny', Road_traffic_density = 'High', Vehicle_condition = 2,
+        Type_of_order = 'Snack', Type_of_vehicle = 'motorcycle', multiple_deliveries = 0.0,
+        Festival = 'No', City = 'Urban'
+    )
+    fields.update(changes)
+    return CustomData(**fields)
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, data: CustomData) -> float:
+        self.calls += 1
+        return 20.0 + data.Delivery_person_Age / 100
+
+
+def make_cache(version: str = 'v1', **config) -> PredictionCache:
+    cache = PredictionCache(config = PredictionCacheConfig(**config))
+    cache.model_version = lambda: version
+    return cache
+
+
+def test_feature_key_normalizes_fields():
+    assert feature_key(order()) == feature_key(order(Weather_conditions = ' Sunny ', Delivery_person_Age = 37))
+    assert feature_key(order()) != feature_key(order(Delivery_person_Age = 38.0))
+
+
+def test_local_hit_skips_the_model():
+    cache, model = make_cache(redis_enabled = False), CountingModel()
+    first = cache.get_or_predict(order(), model)
+    assert cache.get_or_predict(order(), model) == first
+    assert model.calls == 1
+    assert cache.report()['local_hits'] == 1
+
+
+def test_lru_evicts_and_ttl_expires():
+    cache, model = make_cache(redis_enabled = False, max_entries = 2), CountingModel()
+    for age in (30.0, 31.0, 32.0):
+        cache.get_or_predict(order(Delivery_person_Age = age), model)
+    assert cache.report()['evictions'] == 1 and cache.report()['entries'] == 2
+
+    expiring = make_cache(redis_enabled = False, ttl = 0)
+    expiring.get_or_predict(order(), model)
+    expiring.get_or_predict(order(), model)
+    assert expiring.report()['expired'] == 1
+
+
+def test_model_version_change_invalidates(monkeypatch):
+    from src.artifact_cache import artifact_cache
+
+    # model_version() is the real method, only the artifact hash behind it changes
+    versions = iter(['v1', 'v1', 'v2'])
+    monkeypatch.setattr(artifact_cache, 'get', lambda path: None)
+    monkeypatch.setattr(artifact_cache, 'version', lambda *paths: next(versions))
+
+    cache, model = PredictionCache(config = PredictionCacheConfig(redis_enabled = False)), CountingModel()
+    for _ in range(3):
+        cache.get_or_predict(order(), model)
+    assert model.calls == 2
+    assert cache.report()['invalidations'] == 1
+
+
+def test_redis_tier_is_shared_and_uses_one_client(fake_redis, redis_client):
+    model = CountingModel()
+    writer = make_cache(redis_enabled = True)
+    value = writer.get_or_predict(order(), model)
+    assert any(key.startswith('prediction:v1:') for key in redis_client.keys())
+
+    reader = make_cache(redis_enabled = True)
+    for _ in range(10):
+        reader.clear()
+        assert reader.get_or_predict(order(), model) == pytest.approx(value)
+    assert model.calls == 1
+    assert reader.report()['redis_hits'] == 10
+
+    # One client per cache however many lookups and stores it made
+    assert fake_redis.clients == 2
+
+
+def test_redis_down_falls_back_to_local(fake_redis):
+    fake_redis.connected = False
+    cache, model = make_cache(redis_enabled = True), CountingModel()
+    assert cache.get_or_predict(order(), model) == pytest.approx(20.37)
+    assert cache.get_or_predict(order(), model) == pytest.approx(20.37)
+    report = cache.report()
+    assert model.calls == 1 and report['local_hits'] == 1
+    # The first failure starts the backoff, the following lookups do not touch Redis
+    assert report['redis_errors'] == 1
@@ -0,0 +1,49 @@
+import io
+import os
+
+from src.components.schema import read_csv, DELIVERY_SCHEMA
+from src.components.streaming_trainer import StreamingTrainer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def orders_with_gaps(seeded_dir) -> str:
+    '''test.csv with an empty Vehicle_condition and an empty target in its second chunk.'''
+    data = pd.read_csv(os.path.join('artifacts', 'test.csv'), dtype = str, keep_default_na = False)
+    data.loc[150, 'Vehicle_condition'] = ''
+    data.loc[151, 'Time_taken (min)'] = ''
+    data.to_csv('orders.csv', index = False)
+    return 'orders.csv'
+
+
+def test_eager_read_falls_back_to_float(orders_with_gaps):
+    data = read_csv(orders_with_gaps, dtype = {'Vehicle_condition': 'int8'})
+    assert data['Vehicle_condition'].dtype == np.float32
+    assert np.isnan(data.loc[150, 'Vehicle_condition'])
+
+
+@pytest.mark.parametrize('dtype', [None, {'Vehicle_condition': 'int8', 'Time_taken (min)': 'int16'}])
+def test_chunked_read_over_missing_integers(orders_with_gaps, dtype):
+    chunks = list(read_csv(orders_with_gaps, chunksize = 100, dtype = dtype))
+    data = pd.concat(chunks)
+    assert len(chunks) > 2 and len(data) == 13676
+    assert np.isnan(data['Vehicle_condition'].iloc[150])
+    assert np.isnan(data['Time_taken (min)'].iloc[151])
+    assert data['Vehicle_condition'].dtype == np.float32
+
+
+def test_buffer_source_reads_with_schema():
+    data = read_csv(io.StringIO('ID,Vehicle_condition,City\n0x1,2,Urban\n'))
+    assert data['City'].dtype == DELIVERY_SCHEMA['City']
+    assert data['Vehicle_condition'].iloc[0] == 2
+
+
+def test_streaming_training_skips_missing_values(orders_with_gaps, monkeypatch):
+    trainer = StreamingTrainer()
+    monkeypatch.setattr(trainer.config, 'chunk_size', 2000)
+    preprocessor_path, model_path = trainer.initiate_streaming_training(orders_with_gaps)
+    assert os.path.exists(preprocessor_path) and os.path.exists(model_path)
+    assert sum(len(chunk) for chunk, _ in trainer.read_chunks(orders_with_gaps)) == 13675
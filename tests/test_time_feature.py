@@ -0,0 +1,24 @@
+from src.components.time_feature import minute_of_day
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# (time string, minute of day or NaN)
+CASES = [
+    ('23:12', 1392), ('24:00', 0), ('10:00:00', 600), ('9:05', 545), ('9:05:30', 545), (' 10:30 ', 630),
+    ('0.422', np.nan), (None, np.nan), ('', np.nan), ('1:2', np.nan), ('ab:cd', np.nan),
+    ('10:30 junk', np.nan), ('10:30:001', np.nan), ('123456789:00', np.nan),
+    ('१०:३०', np.nan), ('é:30', np.nan), ('10:30 x', np.nan),
+]
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_minute_of_day(categorical):
+    times = pd.Series([time for time, _ in CASES], dtype = 'category' if categorical else object)
+    np.testing.assert_array_equal(minute_of_day(times), np.array([minute for _, minute in CASES], dtype = float))
+
+
+def test_bad_value_does_not_fail_its_batch():
+    times = pd.Series(['10:30'] * 3 + ['१०:३०'], dtype = 'category')
+    np.testing.assert_array_equal(minute_of_day(times), [630, 630, 630, np.nan])
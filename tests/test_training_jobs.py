@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import time
+
+from src.pipeline import training_jobs as module
+from src.pipeline.training_jobs import TrainingJobManager, dataset_key, ACTIVE_STATES
+
+import pytest
+
+
+def slow_job(job_dir: str, url: str, streaming: bool) -> None:
+    status = module.JobStatus(os.path.join(job_dir, 'status.json'), module.read_json(os.path.join(job_dir, 'status.json')))
+    status.update(state = 'running')
+    time.sleep(1.0)
+    status.update(state = 'succeeded')
+
+
+def submit_from_another_process(workdir, url, queue) -> None:
+    os.chdir(workdir)
+    module.run_training_job = slow_job
+    queue.put(TrainingJobManager().submit(url))
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(module, 'run_training_job', slow_job)
+    with open('orders.csv', 'w') as file:
+        file.write('ID\n1\n')
+    return 'orders.csv'
+
+
+@pytest.fixture
+def manager(dataset):
+    manager = TrainingJobManager()
+    yield manager
+    # Jobs and their done callbacks finish while the test directory is still the working directory
+    if manager.executor is not None:
+        manager.executor.shutdown(wait = True)
+
+
+def wait_until_done(manager: TrainingJobManager, job_id: str, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while manager.status(job_id).get('state') in ACTIVE_STATES and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return manager.status(job_id)
+
+
+def test_dataset_key_follows_content_and_mode(dataset):
+    assert dataset_key(dataset, False) == dataset_key(os.path.abspath(dataset), False)
+    assert dataset_key(dataset, False) != dataset_key(dataset, True)
+    before = dataset_key(dataset, False)
+    with open(dataset, 'a') as file:
+        file.write('2\n')
+    assert dataset_key(dataset, False) != before
+
+
+def test_same_dataset_is_deduplicated_across_processes(dataset, manager):
+    job_id = manager.submit(dataset)
+    assert manager.submit(dataset) == job_id
+
+    # A second serving process sees the job registered by this one
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    other = context.Process(target = submit_from_another_process, args = (os.getcwd(), dataset, queue))
+    other.start()
+    assert queue.get(timeout = 30) == job_id
+    other.join()
+
+    assert wait_until_done(manager, job_id)['state'] == 'succeeded'
+    # The registry entry is released by the done callback, a new submit starts a new job
+    deadline = time.monotonic() + 10
+    while os.path.exists(manager.active_path(dataset_key(dataset, False))) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert manager.submit(dataset) != job_id
+
+
+def test_job_of_a_dead_process_is_not_active(dataset, manager):
+    key = dataset_key(dataset, False)
+    os.makedirs(manager.config.active_dir, exist_ok = True)
+    os.makedirs(manager.job_dir('stale'), exist_ok = True)
+    module.write_json(os.path.join(manager.job_dir('stale'), 'status.json'), {'job_id': 'stale', 'state': 'running'})
+
+    context = multiprocessing.get_context('fork')
+    dead = context.Process(target = lambda: None)
+    dead.start()
+    dead.join()
+    module.write_json(manager.active_path(key), {'job_id': 'stale', 'pid': dead.pid})
+
+    assert manager.active_job(key) is None
+    assert manager.submit(dataset) != 'stale'